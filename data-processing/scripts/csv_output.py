@@ -0,0 +1,21 @@
+"""
+csv_output.py
+=============
+CSV writer shared by the preprocessing scripts.
+
+Frames are converted to Arrow tables and written with PyArrow's multithreaded
+C++ CSV writer. Timestamp columns are cast to date32 first, so they are written
+as YYYY-MM-DD.
+"""
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+
+def write_csv(df, path):
+    """Writes `df` with PyArrow's multithreaded CSV writer; datetime columns are written as dates."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table[field.name].cast(pa.date32()))
+    pacsv.write_csv(table, path, write_options=pacsv.WriteOptions(include_header=True))
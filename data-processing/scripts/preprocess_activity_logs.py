@@ -0,0 +1,106 @@
+"""
+preprocess_activity_logs.py
+===========================
+Parses the raw VAST Challenge 2022 Activity Logs once and caches them as a
+single Parquet file shared by preprocess_financial.py and preprocess_turnover.py.
+
+Only the columns used downstream are kept (timestamp, participantId,
+availableBalance, currentEmployer). The file is Zstd-compressed with large row
+groups, so each consumer reads just its own columns straight from disk instead
+of re-tokenizing every ParticipantStatusLogs CSV.
+
+Output:
+  data/activity_logs.parquet
+
+Usage:
+  python preprocess_activity_logs.py
+"""
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import glob
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# ──────────────────────────────────────────────
+# Configuration
+# ──────────────────────────────────────────────
+DATA_DIR = "data"
+LOGS_DIR = os.path.join(DATA_DIR, "Activity Logs")
+OUTPUT_FILE = os.path.join(DATA_DIR, "activity_logs.parquet")
+
+# PyArrow CSV streaming block size (bytes per record batch)
+CSV_BLOCK_SIZE = 64 << 20
+ROW_GROUP_SIZE = 1_000_000
+
+# Timestamps carry a trailing "Z", so they are parsed as UTC and stored naive
+LOG_COLUMN_TYPES = {
+    "timestamp": pa.timestamp("s", tz="UTC"),
+    "participantId": pa.int32(),
+    "availableBalance": pa.float32(),
+    "currentEmployer": pa.int16(),  # nullable: empty when unemployed
+}
+LOG_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("s")),
+    ("participantId", pa.int32()),
+    ("availableBalance", pa.float32()),
+    ("currentEmployer", pa.int16()),
+])
+
+
+def read_status_log(path):
+    """Parses one ParticipantStatusLogs CSV, keeping only the cached columns."""
+    table = pacsv.read_csv(
+        path,
+        # Single-threaded: the process pool already runs one parse per core
+        read_options=pacsv.ReadOptions(use_threads=False, block_size=CSV_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(LOG_COLUMN_TYPES), column_types=LOG_COLUMN_TYPES
+        ),
+    )
+    return table.cast(LOG_SCHEMA)
+
+
+# ──────────────────────────────────────────────
+# 1. Convert Activity Logs
+# ──────────────────────────────────────────────
+# Files are parsed in a process pool (one file per worker); the driver writes
+# the finished tables to Parquet in file order as they come back. Only a window
+# of files one larger than the pool is submitted at a time, so parsed tables do
+# not pile up in the driver while it waits on an earlier file.
+
+if __name__ == "__main__":
+    print("Starting Activity Logs → Parquet conversion...")
+    log_files = sorted(glob.glob(os.path.join(LOGS_DIR, "ParticipantStatusLogs*.csv")))
+
+    if not log_files:
+        print(f"ERROR: No ParticipantStatusLogs files found in '{LOGS_DIR}'.")
+        exit(1)
+
+    print(f"Found {len(log_files)} log files. Writing {OUTPUT_FILE}...")
+    total_rows = 0
+
+    max_workers = min(len(log_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+            pq.ParquetWriter(OUTPUT_FILE, LOG_SCHEMA, compression="zstd") as writer:
+        pending = deque(executor.submit(read_status_log, log_file) for log_file in log_files[:max_workers])
+        for i, log_file in enumerate(log_files):
+            # Queue the next file before waiting on this one, so the pool stays busy
+            if i + max_workers < len(log_files):
+                pending.append(executor.submit(read_status_log, log_files[i + max_workers]))
+            future = pending.popleft()
+            print(f"  [{i+1}/{len(log_files)}] {os.path.basename(log_file)}")
+            try:
+                table = future.result()
+            except Exception as e:
+                print(f"    ERROR: {e}")
+                continue
+            writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+            total_rows += table.num_rows
+
+    file_size_mb = os.path.getsize(OUTPUT_FILE) / (1024 * 1024)
+    print(f"Saved: {OUTPUT_FILE} ({total_rows} rows, {file_size_mb:.2f} MB)")
+
+    print("\n--- Conversion Complete ---")
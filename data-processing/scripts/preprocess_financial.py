@@ -5,12 +5,13 @@ Generates the monthly per-participant financial summary with demographic attribu
 for the Resident Financial Health visualization module.
 
 This script processes three raw data sources from the VAST Challenge 2022 dataset:
-  1. Activity Logs — iteratively processed for memory efficiency (balance snapshots)
+  1. Activity Logs — balance columns of the cached Parquet file, aggregated in one pass
   2. Financial Journal — income (Wage) and expense transactions by category
   3. Participants — demographic attributes (age, education, household size, etc.)
 
 Output:
   data/monthly_participant_logged_spending_demographics.csv
+  data/monthly_participant_logged_spending_demographics.parquet (sorted by Month, one row group per month)
 
 Usage:
   python preprocess_financial.py
@@ -18,10 +19,14 @@ Usage:
 
 import pandas as pd
 import numpy as np
-import glob
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import os
 import gc
 import traceback
+from csv_output import write_csv
 
 print("Starting preprocessing for LOGGED SPENDING + DEMOGRAPHICS intermediate file...")
 
@@ -29,94 +34,144 @@ print("Starting preprocessing for LOGGED SPENDING + DEMOGRAPHICS intermediate fi
 # Configuration
 # ──────────────────────────────────────────────
 DATA_DIR = "data"
-LOGS_DIR = os.path.join(DATA_DIR, "Activity Logs")
+ACTIVITY_LOGS_FILE = os.path.join(DATA_DIR, "activity_logs.parquet")  # from preprocess_activity_logs.py
 ATTR_DIR = os.path.join(DATA_DIR, "Attributes")
 JOURNALS_DIR = os.path.join(DATA_DIR, "Journals")
 FINANCIAL_JOURNAL_FILE = os.path.join(JOURNALS_DIR, "FinancialJournal.csv")
 PARTICIPANTS_FILE = os.path.join(ATTR_DIR, "Participants.csv")
 OUTPUT_FILE = os.path.join(DATA_DIR, "monthly_participant_logged_spending_demographics.csv")
+PARQUET_OUTPUT_FILE = OUTPUT_FILE.replace(".csv", ".parquet")
+
+# PyArrow CSV streaming block size (bytes per record batch)
+CSV_BLOCK_SIZE = 64 << 20
+PARQUET_BATCH_SIZE = 1_000_000
+
+
+def read_projected_csv(path, column_types):
+    """Streams a CSV block-wise, parsing only the columns named in `column_types`."""
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(include_columns=list(column_types), column_types=column_types),
+    )
+    batches = []
+    while True:
+        try:
+            batches.append(reader.read_next_batch())
+        except StopIteration:
+            break
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    # VAST timestamps carry a trailing "Z"; parse as UTC, then drop the zone
+    return table.set_column(
+        table.schema.get_field_index("timestamp"), "timestamp", table["timestamp"].cast(pa.timestamp("s"))
+    )
+
+
+def read_activity_logs(columns):
+    """Reads only `columns` of the cached Activity Logs Parquet file into a DataFrame.
+
+    Each batch is kept as plain NumPy column arrays; these are concatenated once
+    per column and handed to pandas without a further copy.
+    """
+    parquet_file = pq.ParquetFile(ACTIVITY_LOGS_FILE)
+    chunks = {c: [] for c in columns}
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE, columns=columns):
+        for c in columns:
+            chunks[c].append(batch.column(c).to_numpy(zero_copy_only=False))
+    if not chunks[columns[0]]:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame({c: np.concatenate(arrays) for c, arrays in chunks.items()}, copy=False)
+
+
+def binned_category(values, edges, labels):
+    """Bins `values` into left-closed `edges` as a Categorical of `labels`, plus "Unknown"."""
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.searchsorted(edges, values, side="right") - 1
+    codes[np.isnan(values) | (codes < 0) | (codes >= len(labels))] = len(labels)
+    return pd.Categorical.from_codes(codes, categories=[*labels, "Unknown"])
+
+
+def participant_month_key(df):
+    """Packs (participantId, month index) into one int64 so merges hash a single column."""
+    months = df["Month"].values.astype("datetime64[M]").astype(np.int64)
+    return (df["participantId"].to_numpy(dtype=np.int64) << 32) | months
+
+
+def write_parquet_by_month(df, path):
+    """Writes `df` as Zstd Parquet sorted by Month with one row group per month, so readers can filter on Month."""
+    df = df.sort_values(["Month", "participantId"], kind="stable", ignore_index=True)
+    months = df["Month"].to_numpy()
+    bounds = np.r_[0, np.flatnonzero(months[1:] != months[:-1]) + 1, len(df)]
+    # Pandas metadata is dropped: its ArrowDtype entries do not round-trip, while
+    # the plain Arrow schema reads back as categoricals and numpy dtypes
+    table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    month_idx = table.schema.get_field_index("Month")
+    table = table.set_column(month_idx, "Month", table["Month"].cast(pa.date32()))
+    with pq.ParquetWriter(path, table.schema, compression="zstd") as writer:
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            writer.write_table(table.slice(start, end - start))
 
 
 # ──────────────────────────────────────────────
 # 1. Process Activity Logs for Monthly Balances
 # ──────────────────────────────────────────────
-# Uses iterative file-by-file processing to handle large log files
-# without loading everything into memory at once.
+# The logs were parsed once by preprocess_activity_logs.py; only the three
+# balance columns are read back from the Parquet cache.
 
 print("\n--- Processing Activity Logs for Balances ---")
-log_file_pattern = os.path.join(LOGS_DIR, "ParticipantStatusLogs*.csv")
-log_files = sorted(glob.glob(log_file_pattern))
-monthly_balance_summaries_list = []
-balance_cols_to_keep = ["timestamp", "participantId", "availableBalance"]
+df_logs = pd.DataFrame()
 
-if not log_files:
-    print(f"ERROR: No ParticipantStatusLogs files found in '{LOGS_DIR}'.")
+if not os.path.exists(ACTIVITY_LOGS_FILE):
+    print(f"ERROR: '{ACTIVITY_LOGS_FILE}' not found. Run preprocess_activity_logs.py first.")
 else:
-    print(f"Found {len(log_files)} log files. Processing sequentially...")
-    for i, log_file in enumerate(log_files):
-        print(f"  [{i+1}/{len(log_files)}] {os.path.basename(log_file)}")
-        try:
-            df_log_chunk = pd.read_csv(
-                log_file,
-                usecols=balance_cols_to_keep,
-                parse_dates=["timestamp"],
-                dtype={"participantId": "int64", "availableBalance": "float64"},
-            )
-            if df_log_chunk.empty or df_log_chunk["timestamp"].isnull().all():
-                continue
-
-            df_log_chunk = df_log_chunk.dropna(subset=["timestamp"])
-            df_log_chunk["Month"] = df_log_chunk["timestamp"].dt.to_period("M")
-
-            # Aggregate start/end/mean balance within this chunk
-            chunk_summary = (
-                df_log_chunk.sort_values("timestamp")
-                .groupby(["participantId", "Month"])["availableBalance"]
-                .agg(
-                    chunk_start_balance="first",
-                    chunk_end_balance="last",
-                    chunk_mean_balance="mean",
-                )
-                .reset_index()
-            )
-
-            if not chunk_summary.empty:
-                monthly_balance_summaries_list.append(chunk_summary)
-                print(f"    → {len(chunk_summary)} participant-month entries")
-
-            del df_log_chunk, chunk_summary
-            gc.collect()
-
-        except Exception as e:
-            print(f"    ERROR: {e}")
-            continue
-
-# Combine balance data from all file chunks
-if not monthly_balance_summaries_list:
+    print(f"Reading {ACTIVITY_LOGS_FILE}...")
+    try:
+        df_logs = read_activity_logs(["timestamp", "participantId", "availableBalance"])
+        df_logs = df_logs.dropna(subset=["timestamp"])
+    except Exception as e:
+        print(f"ERROR reading activity logs: {e}")
+
+if df_logs.empty:
     print("\nWARNING: No balance data aggregated.")
     monthly_balances_df = pd.DataFrame(
         columns=["participantId", "Month", "start_balance", "end_balance", "mean_balance"]
     )
 else:
-    print("\nCombining balance data across all files...")
-    df_combined = pd.concat(monthly_balance_summaries_list, ignore_index=True)
-
-    # Re-aggregate to get true first/last across file chunks for each month
-    monthly_balances_df = (
-        df_combined.sort_values("Month")
-        .groupby(["participantId", "Month"], observed=False)
-        .agg(
-            start_balance=("chunk_start_balance", "first"),
-            end_balance=("chunk_end_balance", "last"),
-            mean_balance_approx=("chunk_mean_balance", "mean"),
-        )
-        .reset_index()
-    )
+    print(f"\nAggregating {len(df_logs)} log entries into monthly balances...")
+    # Truncate to month start with a plain datetime64 cast (no Period objects)
+    df_logs["Month"] = df_logs["timestamp"].values.astype("datetime64[M]").astype("datetime64[ns]")
+
+    # Sort once so each participant-month is a contiguous, time-ordered run;
+    # first/last/mean then fall out of the run boundaries with plain NumPy
+    keys = participant_month_key(df_logs)
+    order = np.lexsort((df_logs["timestamp"].to_numpy(), keys))
+    keys = keys[order]
+    balances = df_logs["availableBalance"].to_numpy()[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    # Null balances are skipped, as groupby's first/last/mean did: each run's
+    # non-null rows are found by binary search over their positions, and a run
+    # with none keeps its row with NaN balances
+    valid_pos = np.flatnonzero(~np.isnan(balances))
+    first_valid = np.searchsorted(valid_pos, starts)
+    valid_counts = np.searchsorted(valid_pos, ends) - first_valid
+    has_valid = valid_counts > 0
+    start_balance, end_balance, mean_balance = np.full((3, len(starts)), np.nan, dtype=np.float32)
+    start_balance[has_valid] = balances[valid_pos[first_valid[has_valid]]]
+    end_balance[has_valid] = balances[valid_pos[first_valid[has_valid] + valid_counts[has_valid] - 1]]
+    valid_sums = np.add.reduceat(np.nan_to_num(balances), starts, dtype=np.float64)
+    mean_balance[has_valid] = valid_sums[has_valid] / valid_counts[has_valid]
+    monthly_balances_df = pd.DataFrame({
+        "participantId": (keys[starts] >> 32).astype(np.int32),
+        "Month": df_logs["Month"].to_numpy()[order][starts],
+        "start_balance": start_balance,
+        "end_balance": end_balance,
+        "mean_balance": mean_balance,
+    })
     print(f"Monthly balance summary: {monthly_balances_df['participantId'].nunique()} participants")
-    del monthly_balance_summaries_list, df_combined
-    gc.collect()
 
-monthly_balances_df["Month"] = monthly_balances_df["Month"].dt.to_timestamp()
+del df_logs
+gc.collect()
 
 
 # ──────────────────────────────────────────────
@@ -129,46 +184,86 @@ logged_expense_cols = []
 logged_expense_cols_map = {}
 
 try:
-    df_financial = pd.read_csv(
+    # Only the four columns used below are parsed; category is dictionary-encoded
+    df_financial = read_projected_csv(
         FINANCIAL_JOURNAL_FILE,
-        parse_dates=["timestamp"],
-        dtype={"participantId": "int64", "category": "category", "amount": "float64"},
-    )
+        {
+            "timestamp": pa.timestamp("s", tz="UTC"),
+            "participantId": pa.int32(),
+            "category": pa.dictionary(pa.int32(), pa.string()),
+            "amount": pa.float32(),
+        },
+    ).to_pandas()
     if df_financial.empty:
         raise ValueError("Financial Journal is empty.")
 
     df_financial = df_financial.dropna(subset=["timestamp", "participantId"])
-    df_financial["Month"] = df_financial["timestamp"].dt.to_period("M").dt.to_timestamp()
-
-    # Separate income (Wage) from expenses
-    income_mask = df_financial["category"] == "Wage"
-    df_income_trans = df_financial[income_mask].copy()
-    df_expense_trans = df_financial[~income_mask].copy()
-
-    # Aggregate income per participant-month
-    if not df_income_trans.empty:
-        df_income = (
-            df_income_trans.groupby(["participantId", "Month"])
-            .agg(logged_income_total=("amount", "sum"), logged_income_count=("amount", "count"))
-            .reset_index()
+    df_financial["Month"] = df_financial["timestamp"].values.astype("datetime64[M]").astype("datetime64[ns]")
+
+    # Aggregate the whole journal in one pass into a dense
+    # (participant-month × category) matrix: integer-code both keys and
+    # scatter-add with bincount. Income (Wage) and expenses are split on the
+    # small aggregated matrix, so the journal itself is never copied.
+    category_codes = df_financial["category"].cat.codes.to_numpy()
+    has_category = category_codes >= 0
+    if has_category.any():
+        pid_codes, pid_uniques = pd.factorize(df_financial["participantId"].to_numpy()[has_category], sort=True)
+        month_codes, month_uniques = pd.factorize(df_financial["Month"].to_numpy()[has_category], sort=True)
+        n_months = len(month_uniques)
+        pm_codes, pm_uniques = pd.factorize(pid_codes.astype(np.int64) * n_months + month_codes, sort=True)
+
+        categories = df_financial["category"].cat.categories
+        n_pm, n_cat = len(pm_uniques), len(categories)
+        flat_codes = pm_codes * n_cat + category_codes[has_category]
+
+        amounts = df_financial["amount"].to_numpy(dtype=np.float64)[has_category]
+        has_amount = ~np.isnan(amounts)
+        amount_sums = np.bincount(
+            flat_codes, weights=np.where(has_amount, amounts, 0.0), minlength=n_pm * n_cat
+        ).reshape(n_pm, n_cat)
+        amount_counts = np.bincount(flat_codes, weights=has_amount, minlength=n_pm * n_cat).reshape(n_pm, n_cat)
+        row_counts = np.bincount(flat_codes, minlength=n_pm * n_cat).reshape(n_pm, n_cat)
+
+        pm_participants = pid_uniques[pm_uniques // n_months]
+        pm_months = month_uniques[pm_uniques % n_months]
+        is_wage = np.asarray(categories == "Wage")
+
+        # Income per participant-month: the Wage column
+        has_income = row_counts[:, is_wage].sum(axis=1) > 0
+        if has_income.any():
+            df_income = pd.DataFrame({
+                "participantId": pm_participants[has_income],
+                "Month": pm_months[has_income],
+                "logged_income_total": amount_sums[has_income][:, is_wage].sum(axis=1).astype(np.float32),
+                "logged_income_count": amount_counts[has_income][:, is_wage].sum(axis=1).astype(np.int64),
+            })
+            print(f"Logged income: {df_income.shape[0]} rows")
+
+        # Expenses by category: every other column (the Wage column stays, zeroed)
+        amount_sums[:, is_wage] = 0.0
+        amount_counts[:, is_wage] = 0
+        has_expense = row_counts[:, ~is_wage].sum(axis=1) > 0
+    else:
+        has_expense = np.zeros(0, dtype=bool)
+
+    if has_expense.any():
+        df_expenses_pivot = pd.concat(
+            [
+                pd.DataFrame({
+                    "participantId": pm_participants[has_expense],
+                    "Month": pm_months[has_expense],
+                }),
+                pd.DataFrame(
+                    amount_sums[has_expense].astype(np.float32),
+                    columns=[f"logged_expense_{c}" for c in categories],
+                ),
+                pd.DataFrame(
+                    amount_counts[has_expense].astype(np.int64),
+                    columns=[f"logged_count_{c}" for c in categories],
+                ),
+            ],
+            axis=1,
         )
-        print(f"Logged income: {df_income.shape[0]} rows")
-
-    # Aggregate expenses by category, then pivot into columns
-    if not df_expense_trans.empty:
-        df_expenses_grouped = df_expense_trans.groupby(
-            ["participantId", "Month", "category"], observed=False
-        ).agg(total_amount=("amount", "sum"), transaction_count=("amount", "count"))
-
-        df_expenses_pivot = df_expenses_grouped.unstack(level="category", fill_value=0)
-
-        # Flatten multi-level column names
-        new_cols = {}
-        for level0, level1 in df_expenses_pivot.columns:
-            prefix = "logged_expense" if level0 == "total_amount" else "logged_count"
-            new_cols[(level0, level1)] = f"{prefix}_{level1}"
-        df_expenses_pivot.columns = [new_cols[col] for col in df_expenses_pivot.columns]
-        df_expenses_pivot = df_expenses_pivot.reset_index()
 
         # Identify expense columns dynamically
         logged_expense_cols = [c for c in df_expenses_pivot.columns if c.startswith("logged_expense_")]
@@ -183,7 +278,7 @@ try:
 
         print(f"Logged expenses (pivoted): {df_expenses_pivot.shape[0]} rows")
 
-    del df_financial, df_income_trans, df_expense_trans
+    del df_financial
     gc.collect()
 
 except FileNotFoundError:
@@ -203,47 +298,53 @@ try:
         "participantId", "householdSize", "haveKids",
         "age", "educationLevel", "interestGroup", "joviality",
     ]
-    raw = pd.read_csv(PARTICIPANTS_FILE, usecols=demographic_cols)
+    # Free-text attributes stay Arrow dictionary strings; nulls become "Unknown"
+    # in one Arrow pass instead of a categorical add_categories/fillna round trip
+    text_cols = ["educationLevel", "interestGroup"]
+    raw_table = pacsv.read_csv(
+        PARTICIPANTS_FILE,
+        convert_options=pacsv.ConvertOptions(
+            include_columns=demographic_cols,
+            column_types={c: pa.dictionary(pa.int32(), pa.string()) for c in text_cols},
+            strings_can_be_null=True,
+        ),
+    )
+    for c in text_cols:
+        raw_table = raw_table.set_column(
+            raw_table.schema.get_field_index(c), c, pc.fill_null(raw_table[c], "Unknown")
+        )
+    raw = raw_table.to_pandas(types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_dictionary(t) else None)
+    del raw_table
 
     # Derive age groups from birth year
     current_year = pd.Timestamp("now").year
     raw["age"] = pd.to_numeric(raw["age"], errors="coerce")
-    raw["birthYear"] = current_year - raw["age"].astype("Int64")
     age_bins = [1900, 1965, 1981, 1997, current_year + 1]
     age_labels = ["Boomer+ (<1965)", "Gen X (1965-80)", "Millennial (1981-96)", "Gen Z (1997+)"]
-    raw["age_group"] = pd.cut(raw["birthYear"], bins=age_bins, labels=age_labels, right=False, ordered=False)
-    raw["age_group"] = raw["age_group"].astype("category").cat.add_categories("Unknown").fillna("Unknown")
+    raw["age_group"] = binned_category(current_year - raw["age"], age_bins, age_labels)
 
     # Joviality groups
     raw["joviality"] = pd.to_numeric(raw["joviality"], errors="coerce")
-    raw["joviality_group"] = pd.cut(
+    raw["joviality_group"] = binned_category(
         raw["joviality"],
-        bins=[-np.inf, 0.33, 0.66, np.inf],
-        labels=["Low (0-0.33)", "Medium (0.33-0.66)", "High (0.66+)"],
-        right=False, ordered=False,
+        [-np.inf, 0.33, 0.66, np.inf],
+        ["Low (0-0.33)", "Medium (0.33-0.66)", "High (0.66+)"],
     )
-    raw["joviality_group"] = raw["joviality_group"].astype("category").cat.add_categories("Unknown").fillna("Unknown")
 
     # Household size groups
-    raw["householdSize_numeric"] = pd.to_numeric(raw["householdSize"], errors="coerce").astype("Int64")
-    raw["household_size_group"] = raw["householdSize_numeric"].astype(str)
-    raw["household_size_group"] = (
-        raw["household_size_group"]
-        .replace({"5": "5+", "6": "5+", "7": "5+", "8": "5+", "<NA>": "Unknown"})
-        .fillna("Unknown")
-        .astype("category")
+    raw["household_size_group"] = binned_category(
+        pd.to_numeric(raw["householdSize"], errors="coerce"),
+        [1, 2, 3, 4, 5, np.inf],
+        ["1", "2", "3", "4", "5+"],
     )
 
     # Kids flag
     raw["haveKids"] = raw["haveKids"].astype("boolean")
-    raw["haveKids_group"] = (
-        raw["haveKids"].map({True: "Has Kids", False: "No Kids", pd.NA: "Unknown"}).fillna("Unknown").astype("category")
+    raw["haveKids_group"] = pd.Categorical.from_codes(
+        np.where(raw["haveKids"].isna(), 2, np.where(raw["haveKids"].fillna(False), 0, 1)),
+        categories=["Has Kids", "No Kids", "Unknown"],
     )
 
-    # Clean categorical columns
-    raw["educationLevel"] = raw["educationLevel"].fillna("Unknown").astype("category")
-    raw["interestGroup"] = raw["interestGroup"].fillna("Unknown").astype("category")
-
     participants_df = raw[
         [
             "participantId", "householdSize", "haveKids", "age", "educationLevel", "interestGroup", "joviality",
@@ -283,58 +384,40 @@ if not participants_df.empty:
     df_merged = pd.merge(df_merged, participants_df, on="participantId", how="left")
     print(f"After demographics: {df_merged.shape}")
 
+# Income and expenses are outer-joined on a single packed participant-month
+# key; participantId and Month are decoded back from it afterwards
+df_merged["key"] = participant_month_key(df_merged)
+
 # Merge logged income
 if not df_income.empty:
-    df_merged = pd.merge(df_merged, df_income, on=["participantId", "Month"], how="outer")
+    df_income["key"] = participant_month_key(df_income)
+    df_merged = pd.merge(df_merged, df_income.drop(columns=["participantId", "Month"]), on="key", how="outer")
     print(f"After income: {df_merged.shape}")
 else:
     df_merged[["logged_income_total", "logged_income_count"]] = 0.0
 
 # Merge logged expenses
 if not df_expenses_pivot.empty:
-    df_expenses_pivot["participantId"] = df_expenses_pivot["participantId"].astype(int)
-    df_expenses_pivot["Month"] = pd.to_datetime(df_expenses_pivot["Month"])
-    df_merged["participantId"] = df_merged["participantId"].astype(int)
-    df_merged["Month"] = pd.to_datetime(df_merged["Month"])
-    df_merged = pd.merge(df_merged, df_expenses_pivot, on=["participantId", "Month"], how="outer")
+    df_expenses_pivot["key"] = participant_month_key(df_expenses_pivot)
+    df_merged = pd.merge(df_merged, df_expenses_pivot.drop(columns=["participantId", "Month"]), on="key", how="outer")
     print(f"After expenses: {df_merged.shape}")
 else:
     df_merged[["logged_expense_total", "logged_expense_count"]] = 0.0
 
+keys = df_merged.pop("key").to_numpy()
+df_merged["participantId"] = (keys >> 32).astype(np.int32)
+df_merged["Month"] = (keys & 0xFFFFFFFF).astype("datetime64[M]").astype("datetime64[ns]")
+
 
 # ──────────────────────────────────────────────
 # 5. Post-Processing and Final Calculations
 # ──────────────────────────────────────────────
 print("\n--- Post-processing ---")
 
-# Fill NaN financial columns with 0
-financial_fill_cols = [
-    "logged_income_total", "logged_income_count",
-    "logged_expense_total", "logged_expense_count",
-    "start_balance", "end_balance", "mean_balance_approx",
-]
-financial_fill_cols.extend(logged_expense_cols)
-financial_fill_cols.extend([c.replace("expense", "count") for c in logged_expense_cols])
-
-for col in financial_fill_cols:
-    if col in df_merged.columns:
-        df_merged[col] = df_merged[col].fillna(0)
-
-# Fill NaN demographics with "Unknown"
 demo_group_cols = [
     "age_group", "joviality_group", "household_size_group",
     "haveKids_group", "educationLevel", "interestGroup",
 ]
-for col in demo_group_cols:
-    if col in df_merged.columns:
-        if pd.api.types.is_categorical_dtype(df_merged[col]):
-            if "Unknown" not in df_merged[col].cat.categories:
-                df_merged[col] = df_merged[col].cat.add_categories("Unknown")
-        df_merged[col] = df_merged[col].fillna("Unknown")
-
-# Derived metrics
-df_merged["mean_balance"] = df_merged["mean_balance_approx"]
-df_merged["net_logged_change"] = df_merged["logged_income_total"] - df_merged["logged_expense_total"]
 
 # Define and select final column order
 final_cols = [
@@ -351,16 +434,27 @@ final_cols = [
 ]
 final_cols.extend(sorted(logged_expense_cols))
 
+# One schema drives the whole step: financial columns default to 0, demographic
+# groups (and any other missing column) to "Unknown"; counts are int32 and
+# money columns float32. The binned groups already carry an "Unknown"
+# category and the text columns are Arrow strings, so fillna needs no prep.
+count_cols = ["logged_income_count", "logged_expense_count"]
+financial_cols = [
+    "start_balance", "end_balance", "mean_balance",
+    "logged_income_total", "logged_expense_total", "net_logged_change",
+    *count_cols, *logged_expense_cols,
+]
 for col in final_cols:
-    if col not in df_merged.columns:
+    if col not in df_merged.columns and col != "net_logged_change":
         print(f"  Adding missing column '{col}' with default value")
-        df_merged[col] = 0.0 if any(k in col for k in ["total", "balance", "change", "count"]) else "Unknown"
-
-df_final = df_merged[final_cols].copy()
+fill_values = {c: "Unknown" for c in final_cols if c not in df_merged.columns}
+fill_values.update({c: "Unknown" for c in demo_group_cols})
+fill_values.update({c: 0 for c in financial_cols})
+dtype_map = {c: "int32" if c in count_cols else "float32" for c in financial_cols}
 
-# Convert count columns to int
-for col in [c for c in df_final.columns if "count" in c]:
-    df_final[col] = df_final[col].astype(int)
+df_final = df_merged.reindex(columns=final_cols).fillna(fill_values)
+df_final["net_logged_change"] = df_final["logged_income_total"] - df_final["logged_expense_total"]
+df_final = df_final.astype(dtype_map)
 
 print(f"\nFinal shape: {df_final.shape}")
 print(f"Columns: {df_final.columns.tolist()}")
@@ -372,9 +466,11 @@ print(df_final.head())
 # ──────────────────────────────────────────────
 print(f"\n--- Saving to {OUTPUT_FILE} ---")
 try:
-    df_final.to_csv(OUTPUT_FILE, index=False, date_format="%Y-%m-%d")
+    write_csv(df_final, OUTPUT_FILE)
     file_size_mb = os.path.getsize(OUTPUT_FILE) / (1024 * 1024)
     print(f"Saved successfully ({file_size_mb:.2f} MB)")
+    write_parquet_by_month(df_final, PARQUET_OUTPUT_FILE)
+    print(f"Saved {PARQUET_OUTPUT_FILE} ({os.path.getsize(PARQUET_OUTPUT_FILE) / (1024 * 1024):.2f} MB)")
 except Exception as e:
     print(f"ERROR saving: {e}\n{traceback.format_exc()}")
 
@@ -6,6 +6,8 @@ revenue and foot traffic metrics for pubs and restaurants.
 
 Output:
   data/weekly_venue_revenue_traffic.csv
+  data/weekly_revenue_traffic_by_type.csv
+  (plus .parquet copies of both, with compact dtypes, for revenue_visualizations.py)
 
 Usage:
   python preprocess_revenue.py
@@ -13,7 +15,10 @@ Usage:
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+from csv_output import write_csv
 
 print("Starting revenue/traffic preprocessing...")
 
@@ -31,6 +36,23 @@ OUTPUT_FILE = os.path.join(DATA_DIR, "weekly_venue_revenue_traffic.csv")
 
 VENUE_TYPES = ["Pub", "Restaurant"]
 
+
+def write_parquet(df, path):
+    """Writes `df` as Zstd Parquet; datetime columns become date32 and a `week_str` label is added."""
+    df = df.assign(week_str=pd.Categorical(np.datetime_as_string(df["week"].values, unit="D")))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table[field.name].cast(pa.date32()))
+    pq.write_table(table, path, compression="zstd")
+
+
+def week_start(timestamps):
+    """Floors timestamps to the Monday that starts their week, like to_period("W").start_time."""
+    days = timestamps.values.astype("datetime64[D]")
+    # 1970-01-01 (day 0) was a Thursday, i.e. weekday 3 counting from Monday
+    return (days - (days.astype(np.int64) + 3) % 7).astype("datetime64[ns]")
+
 # ──────────────────────────────────────────────
 # Load Data
 # ──────────────────────────────────────────────
@@ -47,18 +69,18 @@ print(f"  Venues: {len(venues)} rows")
 # Filter to Pubs and Restaurants
 # ──────────────────────────────────────────────
 pub_restaurant_venues = venues[venues["type"].isin(VENUE_TYPES)].copy()
-venue_ids = set(pub_restaurant_venues["venueId"])
+venue_ids = np.unique(pub_restaurant_venues["venueId"].to_numpy())  # sorted, unique
 print(f"Pubs + Restaurants: {len(pub_restaurant_venues)} venues")
 
 # ──────────────────────────────────────────────
 # Compute Weekly Foot Traffic (Check-ins)
 # ──────────────────────────────────────────────
 print("Computing weekly foot traffic...")
-checkins_filtered = checkins[checkins["venueId"].isin(venue_ids)].copy()
-checkins_filtered["week"] = checkins_filtered["timestamp"].dt.to_period("W").apply(lambda r: r.start_time)
+checkins_filtered = checkins[np.isin(checkins["venueId"].to_numpy(), venue_ids)].copy()
+checkins_filtered["week"] = week_start(checkins_filtered["timestamp"])
 
 weekly_traffic = (
-    checkins_filtered.groupby(["week", "venueId"])
+    checkins_filtered.groupby(["week", "venueId"], sort=False, observed=True)
     .size()
     .reset_index(name="check_ins")
 )
@@ -81,12 +103,14 @@ financial_venue = financial[
 # Since direct venue-spending linkage varies by dataset version,
 # we use check-in frequency as a proxy and aggregate category spending by week
 
-financial_venue["week"] = financial_venue["timestamp"].dt.to_period("W").apply(lambda r: r.start_time)
+financial_venue["week"] = week_start(financial_venue["timestamp"])
 
-# Aggregate total venue-type spending per week
+# Aggregate total venue-type spending per week (abs once, then the native sum)
+financial_venue["amount"] = financial_venue["amount"].abs()
 weekly_spending_by_type = (
-    financial_venue.groupby(["week"])
-    .agg(total_spending=("amount", lambda x: x.abs().sum()))
+    financial_venue.groupby("week", sort=False, observed=True)["amount"]
+    .sum()
+    .rename("total_spending")
     .reset_index()
 )
 
@@ -98,7 +122,7 @@ weekly_traffic_with_type = weekly_traffic.merge(
 )
 
 # Calculate each venue's share of weekly check-ins
-weekly_total_checkins = weekly_traffic_with_type.groupby("week")["check_ins"].transform("sum")
+weekly_total_checkins = weekly_traffic_with_type.groupby("week", sort=False, observed=True)["check_ins"].transform("sum")
 weekly_traffic_with_type["checkin_share"] = weekly_traffic_with_type["check_ins"] / weekly_total_checkins.replace(0, 1)
 
 # Merge with weekly spending and estimate per-venue revenue
@@ -132,7 +156,7 @@ output = output.sort_values(["week", "venueId"]).reset_index(drop=True)
 # (used for the dual Y-axis trend chart)
 # ──────────────────────────────────────────────
 weekly_by_type = (
-    output.groupby(["week", "venue_type"])
+    output.groupby(["week", "venue_type"], sort=False, observed=True)
     .agg(
         total_check_ins=("check_ins", "sum"),
         total_revenue=("total_revenue", "sum"),
@@ -146,10 +170,27 @@ weekly_by_type["avg_revenue_per_venue"] = weekly_by_type["total_revenue"] / week
 # Save Outputs
 # ──────────────────────────────────────────────
 print(f"\nSaving to {OUTPUT_FILE}...")
-output.to_csv(OUTPUT_FILE, index=False)
+write_csv(output, OUTPUT_FILE)
 
 agg_output_file = os.path.join(DATA_DIR, "weekly_revenue_traffic_by_type.csv")
-weekly_by_type.to_csv(agg_output_file, index=False)
+write_csv(weekly_by_type, agg_output_file)
+
+# Parquet copies for the visualization module: columnar, typed, and carrying
+# the week label so nothing is re-parsed or re-formatted on load
+write_parquet(
+    output.astype({
+        "venueId": "int32", "venue_type": "category", "check_ins": "int32",
+        "total_revenue": "float32", "avg_spend_per_visit": "float32",
+    }),
+    OUTPUT_FILE.replace(".csv", ".parquet"),
+)
+write_parquet(
+    weekly_by_type.astype({
+        "venue_type": "category", "total_check_ins": "int32", "total_revenue": "float32",
+        "venue_count": "int32", "avg_revenue_per_venue": "float32",
+    }),
+    agg_output_file.replace(".csv", ".parquet"),
+)
 
 print(f"  Per-venue: {OUTPUT_FILE} ({len(output)} rows)")
 print(f"  By type:   {agg_output_file} ({len(weekly_by_type)} rows)")
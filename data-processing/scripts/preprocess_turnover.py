@@ -17,9 +17,11 @@ Usage:
 
 import pandas as pd
 import numpy as np
-import glob
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 import gc
+from csv_output import write_csv
 
 print("Starting employment/turnover preprocessing...")
 
@@ -27,40 +29,39 @@ print("Starting employment/turnover preprocessing...")
 # Configuration
 # ──────────────────────────────────────────────
 DATA_DIR = "data"
-LOGS_DIR = os.path.join(DATA_DIR, "Activity Logs")
+ACTIVITY_LOGS_FILE = os.path.join(DATA_DIR, "activity_logs.parquet")  # from preprocess_activity_logs.py
 ATTR_DIR = os.path.join(DATA_DIR, "Attributes")
 OUTPUT_DIR = os.path.join(DATA_DIR, "restructure_data")
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+PARQUET_BATCH_SIZE = 1_000_000
+
+
+def read_activity_logs_table(columns):
+    """Reads only `columns` of the cached Activity Logs Parquet file, batch by batch."""
+    parquet_file = pq.ParquetFile(ACTIVITY_LOGS_FILE)
+    schema = pa.schema([parquet_file.schema_arrow.field(c) for c in columns])
+    return pa.Table.from_batches(
+        parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE, columns=columns), schema=schema
+    )
+
+
 # ──────────────────────────────────────────────
-# 1. Load Activity Logs (iteratively for memory)
+# 1. Load Activity Logs (cached Parquet, employment columns only)
 # ──────────────────────────────────────────────
 print("\n--- Loading Activity Logs ---")
-log_pattern = os.path.join(LOGS_DIR, "ParticipantStatusLogs*.csv")
-log_files = sorted(glob.glob(log_pattern))
 
-if not log_files:
-    print(f"ERROR: No log files found in {LOGS_DIR}")
+if not os.path.exists(ACTIVITY_LOGS_FILE):
+    print(f"ERROR: '{ACTIVITY_LOGS_FILE}' not found. Run preprocess_activity_logs.py first.")
     exit(1)
 
-print(f"Found {len(log_files)} log files.")
-
-cols_to_keep = ["timestamp", "participantId", "currentEmployer"]
-all_chunks = []
+logs_table = read_activity_logs_table(["timestamp", "participantId", "currentEmployer"])
 
-for i, f in enumerate(log_files):
-    print(f"  [{i+1}/{len(log_files)}] {os.path.basename(f)}")
-    try:
-        chunk = pd.read_csv(f, usecols=cols_to_keep, parse_dates=["timestamp"])
-        chunk = chunk.dropna(subset=["timestamp"])
-        all_chunks.append(chunk)
-    except Exception as e:
-        print(f"    ERROR: {e}")
-        continue
-
-df_logs = pd.concat(all_chunks, ignore_index=True)
-del all_chunks
+# Keep currentEmployer as nullable Int16 rather than letting nulls promote it to float64
+df_logs = logs_table.to_pandas(types_mapper={pa.int16(): pd.Int16Dtype()}.get)
+df_logs = df_logs.dropna(subset=["timestamp"])
+del logs_table
 gc.collect()
 
 print(f"Total log entries: {len(df_logs)}")
@@ -71,25 +72,23 @@ print(f"Total log entries: {len(df_logs)}")
 print("\n--- Extracting employment records ---")
 
 # A participant is employed if currentEmployer is not NaN
-df_logs["date"] = df_logs["timestamp"].dt.date
-df_logs["month"] = df_logs["timestamp"].dt.to_period("M").astype(str)
-
-# For each participant per day, take the last known employment status
-df_daily = (
-    df_logs.sort_values("timestamp")
-    .groupby(["participantId", "date"])
-    .agg(currentEmployer=("currentEmployer", "last"))
-    .reset_index()
+# Day keys as datetime64 (not Python date objects) so they sort and hash natively
+df_logs["date"] = df_logs["timestamp"].values.astype("datetime64[D]").astype("datetime64[ns]")
+
+# For each participant per day, take the last known employer.
+# One stable sort makes every (participant, day) a contiguous time-ordered run,
+# so keeping the last employed row of each run is a linear adjacent-row scan.
+df_logs = df_logs.sort_values(["participantId", "date", "timestamp"], kind="stable")
+df_employed = (
+    df_logs.loc[df_logs["currentEmployer"].notna(), ["participantId", "date", "currentEmployer"]]
+    .drop_duplicates(subset=["participantId", "date"], keep="last")
 )
-
-# Filter to employed records only (non-null employer)
-df_employed = df_daily[df_daily["currentEmployer"].notna()].copy()
-df_employed["employerId"] = df_employed["currentEmployer"].astype(int)
-df_employed["date"] = pd.to_datetime(df_employed["date"])
+df_employed["employerId"] = df_employed["currentEmployer"].astype("int16")
+df_employed["month"] = df_employed["date"].values.astype("datetime64[M]").astype("datetime64[ns]")
 
 # Save flat employment records (used by layoff_timeline.py)
 work_output = os.path.join(OUTPUT_DIR, "work.csv")
-df_employed[["participantId", "date", "employerId"]].to_csv(work_output, index=False)
+write_csv(df_employed[["participantId", "date", "employerId"]], work_output)
 print(f"Saved: {work_output} ({len(df_employed)} rows)")
 
 # ──────────────────────────────────────────────
@@ -97,19 +96,23 @@ print(f"Saved: {work_output} ({len(df_employed)} rows)")
 # ──────────────────────────────────────────────
 print("\n--- Aggregating workers by company-month ---")
 
-df_employed["month"] = df_employed["date"].dt.to_period("M").astype(str)
-
-# Count unique workers per employer per month
+# Count unique workers per employer per month: dedupe the (employer, month,
+# participant) triples, then a plain group size
 workers_by_company = (
-    df_employed.groupby(["employerId", "month"])["participantId"]
-    .nunique()
-    .reset_index()
-    .rename(columns={"participantId": "worker_count"})
+    df_employed.drop_duplicates(subset=["employerId", "month", "participantId"])
+    .groupby(["employerId", "month"], sort=False, observed=True)
+    .size()
+    .reset_index(name="worker_count")
+    .sort_values(["employerId", "month"], ignore_index=True)
+)
+# Format "YYYY-MM" labels on the aggregated rows only
+workers_by_company["month"] = np.datetime_as_string(
+    workers_by_company["month"].values.astype("datetime64[M]"), unit="M"
 )
 
 # Save (used by layoff_map.py, layoff_treemap.py, app.py)
 company_output = os.path.join(OUTPUT_DIR, "workers_by_company_month.csv")
-workers_by_company.to_csv(company_output, index=False)
+write_csv(workers_by_company, company_output)
 print(f"Saved: {company_output} ({len(workers_by_company)} rows)")
 print(f"  Unique employers: {workers_by_company['employerId'].nunique()}")
 print(f"  Month range: {workers_by_company['month'].min()} to {workers_by_company['month'].max()}")
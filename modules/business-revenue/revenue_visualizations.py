@@ -22,28 +22,56 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow.parquet as pq
 from plotly.subplots import make_subplots
 import os
 
 print("Generating Business Revenue visualizations...")
 
+# Serialize figures with orjson (C encoder) instead of the pure-Python JSON encoder
+pio.json.config.default_engine = "orjson"
+
 # ──────────────────────────────────────────────
 # Configuration
 # ──────────────────────────────────────────────
 DATA_DIR = "data"
-VENUE_DATA_FILE = os.path.join(DATA_DIR, "weekly_venue_revenue_traffic.csv")
-TYPE_DATA_FILE = os.path.join(DATA_DIR, "weekly_revenue_traffic_by_type.csv")
+VENUE_DATA_FILE = os.path.join(DATA_DIR, "weekly_venue_revenue_traffic.parquet")
+TYPE_DATA_FILE = os.path.join(DATA_DIR, "weekly_revenue_traffic_by_type.parquet")
+
+# Grid cells per axis used to bin venues in the animated scatter
+SCATTER_GRID = 60
 
 
 # ──────────────────────────────────────────────
 # Load Data
 # ──────────────────────────────────────────────
-print("Loading preprocessed data...")
-df_venue = pd.read_csv(VENUE_DATA_FILE, parse_dates=["week"])
-df_type = pd.read_csv(TYPE_DATA_FILE, parse_dates=["week"])
+def load_weekly(parquet_file):
+    """Reads a preprocess_revenue.py output, preferring the typed Parquet copy over the CSV."""
+    if os.path.exists(parquet_file):
+        return pq.read_table(parquet_file).to_pandas(date_as_object=False)
+    df = pd.read_csv(parquet_file.replace(".parquet", ".csv"), parse_dates=["week"])
+    # Format each distinct week once and broadcast, rather than strftime per row
+    weeks = df["week"].drop_duplicates()
+    labels = dict(zip(weeks, weeks.dt.strftime("%Y-%m-%d")))
+    df["week_str"] = df["week"].map(labels).astype("category")
+    return df
+
+
+def q98(values):
+    """98th percentile (linear interpolation) via np.partition selection instead of a full sort."""
+    a = np.asarray(values, dtype=np.float64)
+    pos = 0.98 * (a.size - 1)
+    k = int(pos)
+    if k + 1 >= a.size:
+        return np.partition(a, k)[k]
+    lo, hi = np.partition(a, [k, k + 1])[[k, k + 1]]
+    return lo + (hi - lo) * (pos - k)
 
-df_venue["week_str"] = df_venue["week"].dt.strftime("%Y-%m-%d")
-df_type["week_str"] = df_type["week"].dt.strftime("%Y-%m-%d")
+
+print("Loading preprocessed data...")
+df_venue = load_weekly(VENUE_DATA_FILE)
+df_type = load_weekly(TYPE_DATA_FILE)
 
 print(f"  Per-venue data: {len(df_venue)} rows, {df_venue['venueId'].nunique()} venues")
 print(f"  By-type data: {len(df_type)} rows")
@@ -56,21 +84,45 @@ print(f"  By-type data: {len(df_type)} rows")
 print("\nCreating animated scatter plot...")
 
 # Aggregate per venue per week for cleaner animation
-df_anim = df_venue.copy()
-df_anim["avg_spend_per_visit"] = df_anim["avg_spend_per_visit"].clip(lower=1)
+# .assign only allocates the replaced columns instead of deep-copying df_venue;
+# float32 columns reach Plotly as numpy arrays it can pack as base64 typed arrays
+df_anim = df_venue.assign(
+    check_ins=df_venue["check_ins"].to_numpy(np.float32),
+    total_revenue=df_venue["total_revenue"].to_numpy(np.float32),
+    avg_spend_per_visit=np.maximum(df_venue["avg_spend_per_visit"].to_numpy(np.float32), 1),
+)
+
+# Fix axis ranges across all animation frames for consistent comparison
+max_checkins = q98(df_anim["check_ins"]) * 1.1
+max_revenue = q98(df_anim["total_revenue"]) * 1.1
+x_max = max(max_checkins, 100)
+y_max = max(max_revenue, 100)
+
+# Bin venues onto a SCATTER_GRID × SCATTER_GRID check-in/revenue grid per week
+# and venue type, so each frame draws one bubble per occupied cell (placed at
+# the members' mean, sized by their mean spend) instead of one per venue
+df_anim["xb"] = (df_anim["check_ins"] // (x_max / SCATTER_GRID)).astype(np.int32)
+df_anim["yb"] = (df_anim["total_revenue"] // (y_max / SCATTER_GRID)).astype(np.int32)
+df_binned = df_anim.groupby(["week_str", "venue_type", "xb", "yb"], as_index=False, observed=True).agg(
+    check_ins=("check_ins", "mean"),
+    total_revenue=("total_revenue", "mean"),
+    avg_spend_per_visit=("avg_spend_per_visit", "mean"),
+    venues=("venueId", "size"),
+)
+print(f"  Binned {len(df_anim)} venue-weeks into {len(df_binned)} bubbles")
 
 fig_scatter = px.scatter(
-    df_anim,
+    df_binned,
     x="check_ins",
     y="total_revenue",
     size="avg_spend_per_visit",
     color="venue_type",
     animation_frame="week_str",
-    hover_name="venueId",
     hover_data={
-        "check_ins": True,
+        "check_ins": ":.0f",
         "total_revenue": ":.2f",
         "avg_spend_per_visit": ":.2f",
+        "venues": True,
         "venue_type": True,
         "week_str": False,
     },
@@ -78,6 +130,7 @@ fig_scatter = px.scatter(
         "check_ins": "Number of Check-ins (Foot Traffic)",
         "total_revenue": "Total Spending (Revenue)",
         "avg_spend_per_visit": "Avg Spending per Visit",
+        "venues": "Venues",
         "venue_type": "Venue Type",
     },
     title="Weekly Revenue vs. Foot Traffic Correlation for Pubs and Restaurants",
@@ -99,13 +152,31 @@ fig_scatter.update_layout(
     ),
 )
 
-# Fix axis ranges across all animation frames for consistent comparison
-max_checkins = df_anim["check_ins"].quantile(0.98) * 1.1
-max_revenue = df_anim["total_revenue"].quantile(0.98) * 1.1
-fig_scatter.update_xaxes(range=[0, max(max_checkins, 100)])
-fig_scatter.update_yaxes(range=[0, max(max_revenue, 100)])
-
-# Slow down animation speed
+fig_scatter.update_xaxes(range=[0, x_max])
+fig_scatter.update_yaxes(range=[0, y_max])
+
+# Trim every frame to the fields that change between weeks (positions, sizes,
+# hover data) and address the base traces by index; styling, hover templates
+# and legend entries stay on the base traces instead of being copied per week.
+# A venue type missing from a week gets an empty update so no stale bubbles linger.
+trace_index = {trace.name: i for i, trace in enumerate(fig_scatter.data)}
+for frame in fig_scatter.frames:
+    frame_traces = {trace.name: trace for trace in frame.data}
+    frame.data = [
+        go.Scatter(
+            x=frame_traces[name].x,
+            y=frame_traces[name].y,
+            customdata=frame_traces[name].customdata,
+            marker=dict(size=frame_traces[name].marker.size),
+        )
+        if name in frame_traces
+        else go.Scatter(x=[], y=[], customdata=[], marker=dict(size=[]))
+        for name in trace_index
+    ]
+    frame.traces = list(trace_index.values())
+
+# Slow down animation speed; frames only move existing points, so skip full redraws
+fig_scatter.layout.updatemenus[0].buttons[0].args[1]["frame"]["redraw"] = False
 fig_scatter.layout.updatemenus[0].buttons[0].args[1]["frame"]["duration"] = 500
 fig_scatter.layout.updatemenus[0].buttons[0].args[1]["transition"]["duration"] = 300
 
@@ -130,8 +201,8 @@ for venue_type in ["Pub", "Restaurant"]:
     # Revenue line (left Y-axis)
     fig_trends.add_trace(
         go.Scatter(
-            x=df_vt["week"],
-            y=df_vt["total_revenue"],
+            x=df_vt["week"].to_numpy(),
+            y=df_vt["total_revenue"].to_numpy(np.float32),
             name=f"{venue_type} Spending",
             line=dict(color=colors[venue_type], width=2),
             mode="lines",
@@ -143,8 +214,8 @@ for venue_type in ["Pub", "Restaurant"]:
     # Check-ins line (right Y-axis, dashed)
     fig_trends.add_trace(
         go.Scatter(
-            x=df_vt["week"],
-            y=df_vt["total_check_ins"],
+            x=df_vt["week"].to_numpy(),
+            y=df_vt["total_check_ins"].to_numpy(np.float32),
             name=f"{venue_type} Check-ins",
             line=dict(color=colors[venue_type], width=2, dash="dash"),
             mode="lines",
@@ -1,61 +1,28 @@
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from shapely import wkt
+import plotly.io as pio
 import plotly.express as px
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import json
+from layoff_pipeline import (
+    WORKERS_FILE, EMPLOYERS_FILE, BUILDINGS_FILE, PIPELINE_FILE,
+    get_march_companies, get_layoff_df, load_building_outlines, cached_figure,
+)
 
-print("Loading data...")
-# Load all required datasets
-work_df = pd.read_csv("restructure_data/workers_by_company_month.csv")
-employers_df = pd.read_csv("Attributes/Employers.csv")
-buildings_df = pd.read_csv("Attributes/Buildings.csv")
-print(f"Loaded {len(work_df)} rows from workers data")
-print(f"Loaded {len(employers_df)} rows from employers data")
-print(f"Loaded {len(buildings_df)} rows from buildings data")
-
-# Print column names to verify structure
-print(f"Workers columns: {work_df.columns.tolist()}")
-
-# Get first month data (March 2022)
-march_data = work_df[work_df['month'] == '2022-03'].copy()
-print(f"Found {len(march_data)} companies in March 2022")
-
-# Get second month data (April 2022)
-april_data = work_df[work_df['month'] == '2022-04'].copy()
-print(f"Found {len(april_data)} companies in April 2022")
-
-# Prepare data for visualizations
-layoff_data = []
+# Serialize figures with orjson (C encoder) instead of the pure-Python JSON encoder
+pio.json.config.default_engine = "orjson"
 
-# Calculate layoffs between March and April
-for _, company in march_data.iterrows():
-    company_id = company['employerId']
-    march_count = company['worker_count']
-    
-    # Find if company exists in April
-    april_company = april_data[april_data['employerId'] == company_id]
-    if len(april_company) > 0:
-        april_count = april_company.iloc[0]['worker_count']
-        layoff_count = max(0, march_count - april_count)  # Prevent negative values
-    else:
-        # Company doesn't exist in April, all workers laid off
-        layoff_count = march_count
-    
-    # Only include companies with layoffs
-    if layoff_count > 0:
-        layoff_data.append({
-            'company_id': company_id,
-            'original_size': march_count,
-            'layoffs': layoff_count,
-            'layoff_percentage': (layoff_count / march_count * 100) if march_count > 0 else 0
-        })
+print("Loading data...")
+# Load all required datasets through the shared (memoized, Feather-cached) pipeline
+march_companies = get_march_companies()
+print(f"Found {len(march_companies)} companies in March 2022")
 
-# Convert to DataFrame
-layoff_df = pd.DataFrame(layoff_data)
+# Only include companies with layoffs
+map_df = get_layoff_df()
+layoff_df = map_df[['company_id', 'original_size', 'layoffs', 'layoff_percentage', 'size_category']]
 print(f"Found {len(layoff_df)} companies with layoffs")
 
 if len(layoff_df) == 0:
@@ -65,37 +32,6 @@ if len(layoff_df) == 0:
 print("Sample layoff data:")
 print(layoff_df.head())
 
-# Add company size category
-def assign_category(size):
-    if size >= 10:
-        return "Large (10+ employees)"
-    elif size >= 5:
-        return "Medium (5-9 employees)"
-    else:
-        return "Small (<5 employees)"
-
-layoff_df['size_category'] = layoff_df['original_size'].apply(assign_category)
-
-# Extract coordinates from location column in employers_df
-print("Parsing location data...")
-# Extract coordinates using string operations
-def parse_point_coordinates(point_str):
-    coords = point_str.replace('POINT (', '').replace(')', '').split()
-    return float(coords[0]), float(coords[1])
-
-employers_df['x'], employers_df['y'] = zip(*employers_df['location'].apply(parse_point_coordinates))
-
-# Merge with layoff_df to get location data
-map_df = layoff_df.merge(
-    employers_df[['employerId', 'x', 'y', 'buildingId']], 
-    left_on='company_id', 
-    right_on='employerId', 
-    how='left'
-)
-
-# Use buildingId as name
-map_df['name'] = map_df['buildingId'].fillna(map_df['company_id']).astype(str)
-
 # Check for missing location data
 missing_locations = map_df[map_df['x'].isna() | map_df['y'].isna()]
 if len(missing_locations) > 0:
@@ -106,38 +42,33 @@ if len(missing_locations) > 0:
 
 # Function to create the layoff map
 def create_layoff_map():
+    # Building outlines are only parsed (or memory-mapped) when the map is rebuilt
+    building_outlines = load_building_outlines()
+    print(f"Loaded {int(np.isnan(building_outlines[0]).sum())} building outlines")
+    
     # Create a Plotly figure
     fig = go.Figure()
     
-    # Process buildings data for Plotly
-    for _, building in buildings_df.iterrows():
-        # Parse the polygon string using shapely's wkt loader
-        polygon_str = building['location']
-        polygon = wkt.loads(polygon_str)
-        
-        # Get the exterior coordinates of the polygon
-        x, y = polygon.exterior.xy
-        
-        # Add polygon to the figure
-        fig.add_trace(go.Scatter(
-            x=list(x) + [x[0]],  # Close the polygon
-            y=list(y) + [y[0]],
-            fill="toself",
-            fillcolor='rgba(0, 0, 0, 0)',  # Transparent fill
-            line=dict(color='rgba(80, 80, 80, 1)', width=1),  # Darker line for buildings
-            mode='lines',
-            hoverinfo='skip',
-            showlegend=False
-        ))
+    # Building footprints: one trace, NaN breaks between polygons
+    fig.add_trace(go.Scatter(
+        x=building_outlines[0],
+        y=building_outlines[1],
+        fill="toself",
+        fillcolor='rgba(0, 0, 0, 0)',  # Transparent fill
+        line=dict(color='rgba(80, 80, 80, 1)', width=1),  # Darker line for buildings
+        mode='lines',
+        hoverinfo='skip',
+        showlegend=False
+    ))
     
     # Add employer points with layoff information
     fig.add_trace(go.Scatter(
-        x=map_df['x'],
-        y=map_df['y'],
+        x=map_df['x'].to_numpy(np.float32),
+        y=map_df['y'].to_numpy(np.float32),
         mode='markers',
         marker=dict(
-            size=map_df['layoffs'].apply(lambda x: max(15, x*3)),
-            color=map_df['layoffs'],
+            size=np.maximum(15, map_df['layoffs'].to_numpy() * 3).astype(np.float32),
+            color=map_df['layoffs'].to_numpy(np.float32),
             colorscale='Reds',
             colorbar=dict(
                 title="Layoffs",
@@ -148,12 +79,11 @@ def create_layoff_map():
             ),
             line=dict(width=1, color='gray')
         ),
-        text=map_df.apply(
-            lambda row: f"ID: {row['company_id']}<br>" +
-                        f"Original Size: {row['original_size']}<br>" +
-                        f"Layoffs: {row['layoffs']}<br>" +
-                        f"Layoff %: {row['layoff_percentage']:.1f}%",
-            axis=1
+        text=(
+            "ID: " + map_df['company_id'].astype(str) +
+            "<br>Original Size: " + map_df['original_size'].astype(str) +
+            "<br>Layoffs: " + map_df['layoffs'].astype(str) +
+            "<br>Layoff %: " + map_df['layoff_percentage'].round(1).astype(str) + "%"
         ),
         hoverinfo='text',
         name='Employers with Layoffs'
@@ -204,65 +134,35 @@ def create_layoff_treemap():
     # Create the main figure
     fig = go.Figure()
     
-    # Create data for hierarchical treemap (layoff count)
-    labels = ["All Companies"]  # Root node
-    parents = [""]  # Root has no parent
-    values = [layoff_df['layoffs'].sum()]  # Sum of all layoffs
-    
-    # Add category nodes
-    for category in sorted(layoff_df['size_category'].unique()):
-        labels.append(category)
-        parents.append("All Companies")
-        values.append(layoff_df[layoff_df['size_category'] == category]['layoffs'].sum())
-    
-    # Add company nodes with their parents as categories
-    for _, company in layoff_df.iterrows():
-        labels.append(str(company['company_id']))
-        parents.append(company['size_category'])
-        values.append(company['layoffs'])
-    
-    # Create customdata for hovering
-    # First calculate aggregated data for categories
-    category_data = {}
-    for category in layoff_df['size_category'].unique():
-        category_companies = layoff_df[layoff_df['size_category'] == category]
-        category_data[category] = {
-            'total_original_size': category_companies['original_size'].sum(),
-            'total_layoffs': category_companies['layoffs'].sum(),
-            'avg_layoff_pct': (category_companies['layoffs'].sum() / category_companies['original_size'].sum() * 100)
-        }
-    
-    # Start with data for root node (total of all companies)
-    custom_sizes = [layoff_df['original_size'].sum()]
-    custom_layoffs = [layoff_df['layoffs'].sum()]
-    custom_layoff_pct = [(layoff_df['layoffs'].sum() / layoff_df['original_size'].sum() * 100)]
-    
-    # Add data for category nodes
-    for category in sorted(layoff_df['size_category'].unique()):
-        custom_sizes.append(category_data[category]['total_original_size'])
-        custom_layoffs.append(category_data[category]['total_layoffs'])
-        custom_layoff_pct.append(category_data[category]['avg_layoff_pct'])
+    # Create data for hierarchical treemap (layoff count): every per-node array
+    # is root node, then one node per size category (sorted), then one per company
+    cat_agg = layoff_df.groupby('size_category', sort=True).agg(
+        orig=('original_size', 'sum'),
+        lay=('layoffs', 'sum')
+    )
+    categories = cat_agg.index.to_numpy()
+    n_categories = len(categories)
+    root_orig = layoff_df['original_size'].sum()
+    root_lay = layoff_df['layoffs'].sum()
     
-    # Add company-specific data
-    for _, company in layoff_df.iterrows():
-        custom_sizes.append(company['original_size'])
-        custom_layoffs.append(company['layoffs'])
-        custom_layoff_pct.append(company['layoff_percentage'])
+    labels = np.concatenate([["All Companies"], categories, layoff_df['company_id'].astype(str).to_numpy()])
+    parents = np.concatenate([[""], np.repeat("All Companies", n_categories), layoff_df['size_category'].to_numpy()])
+    values = np.concatenate([[root_lay], cat_agg['lay'].to_numpy(), layoff_df['layoffs'].to_numpy()])
     
-    # Create color array for all nodes
-    color_array = [-1] * (len(layoff_df['size_category'].unique()) + 1)
+    # Create customdata for hovering: original size, layoffs, layoff %
+    custom_sizes = np.concatenate([[root_orig], cat_agg['orig'].to_numpy(), layoff_df['original_size'].to_numpy()])
+    custom_layoffs = values
+    custom_layoff_pct = np.concatenate([
+        [root_lay / root_orig * 100],
+        (cat_agg['lay'] / cat_agg['orig'] * 100).to_numpy(),
+        layoff_df['layoff_percentage'].to_numpy()
+    ])
     
-    # Add company-specific size as color values
-    for _, company in layoff_df.iterrows():
-        color_array.append(company['original_size'])
+    # Color by company size; root and category nodes get -1
+    color_array = np.concatenate([np.full(n_categories + 1, -1), layoff_df['original_size'].to_numpy()])
     
-    # Create line width array to only show borders on categories
-    line_width_array = []
-    line_width_array.append(1)  # Root node
-    for _ in range(len(layoff_df['size_category'].unique())):
-        line_width_array.append(1)  # Category nodes
-    for _ in range(len(layoff_df)):
-        line_width_array.append(0)  # Company nodes
+    # Create line width array to only show borders on root and categories
+    line_width_array = np.concatenate([np.ones(n_categories + 1, dtype=int), np.zeros(len(layoff_df), dtype=int)])
     
     # Add the treemap (sized by layoff count)
     fig.add_trace(go.Treemap(
@@ -309,21 +209,26 @@ def create_layoff_treemap():
 
 # Function to create summary statistics
 def create_summary_stats():
+    # Reduce on the underlying numpy arrays rather than through pandas' nanops
+    original_sizes = march_companies['original_size'].to_numpy()
+    layoffs = layoff_df['layoffs'].to_numpy()
+
     # Using the original March data for total count (including companies without layoffs)
-    total_companies = len(march_data)
-    total_original_workers = march_data['worker_count'].sum()
+    total_companies = len(original_sizes)
+    total_original_workers = original_sizes.sum()
     
     # Total layoffs calculation remains the same
-    total_layoffs = layoff_df['layoffs'].sum()
+    total_layoffs = layoffs.sum()
     
     # This now reflects the true percentage across all companies
     avg_layoff_pct = (total_layoffs / total_original_workers) * 100
     
     # Count layoff companies by size category
-    size_counts = layoff_df['size_category'].value_counts().to_dict()
+    categories, counts = np.unique(layoff_df['size_category'].to_numpy(), return_counts=True)
+    size_counts = dict(zip(categories.tolist(), counts.tolist()))
     
     # Count of companies that had layoffs (for comparison)
-    companies_with_layoffs = len(layoff_df)
+    companies_with_layoffs = len(layoffs)
     
     return {
         'total_companies': total_companies,
@@ -334,6 +239,10 @@ def create_summary_stats():
         'size_counts': size_counts
     }
 
+# Both figures are cached as JSON and only rebuilt when their inputs or this
+# script change
+FIGURE_SOURCES = [WORKERS_FILE, EMPLOYERS_FILE, PIPELINE_FILE, __file__]
+
 # Initialize the Dash app
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server
@@ -372,7 +281,7 @@ app.layout = html.Div([
                 html.Div([
                     dcc.Graph(
                         id='layoff-map',
-                        figure=create_layoff_map(),
+                        figure=cached_figure('app_layoff_map', FIGURE_SOURCES + [BUILDINGS_FILE], create_layoff_map),
                         config={'responsive': True},
                         style={'height': '900px', 'width': '100%'}
                     )
@@ -383,7 +292,7 @@ app.layout = html.Div([
                 html.Div([
                     dcc.Graph(
                         id='layoff-treemap',
-                        figure=create_layoff_treemap(),
+                        figure=cached_figure('app_layoff_treemap', FIGURE_SOURCES, create_layoff_treemap),
                         config={'responsive': True},
                         style={'height': '700px', 'width': '100%'}
                     )
@@ -1,139 +1,58 @@
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from shapely import wkt
+import plotly.io as pio
 import plotly.express as px
+from layoff_pipeline import get_layoff_df, load_building_outlines
 
-# Load the data
-print("Loading data...")
-work_df = pd.read_csv("restructure_data/workers_by_company_month.csv")
-employers_df = pd.read_csv("Attributes/Employers.csv")
-buildings_df = pd.read_csv("Attributes/Buildings.csv")
-print(f"Loaded {len(work_df)} rows from workers data")
-print(f"Loaded {len(employers_df)} rows from employers data")
-print(f"Loaded {len(buildings_df)} rows from buildings data")
-
-# Print column names to verify structure
-print(f"Workers columns: {work_df.columns.tolist()}")
-print(f"Employers columns: {employers_df.columns.tolist()}")
-
-# Get first month data (March 2022)
-march_data = work_df[work_df['month'] == '2022-03'].copy()
-print(f"Found {len(march_data)} companies in March 2022")
-
-# Get second month data (April 2022)
-april_data = work_df[work_df['month'] == '2022-04'].copy()
-print(f"Found {len(april_data)} companies in April 2022")
-
-# Prepare data for map
-map_data = []
+# Serialize figures with orjson (C encoder) instead of the pure-Python JSON encoder
+pio.json.config.default_engine = "orjson"
 
-# Calculate layoffs between March and April
-for _, company in march_data.iterrows():
-    company_id = company['employerId']
-    march_count = company['worker_count']
-    
-    # Find if company exists in April
-    april_company = april_data[april_data['employerId'] == company_id]
-    if len(april_company) > 0:
-        april_count = april_company.iloc[0]['worker_count']
-        layoff_count = max(0, march_count - april_count)  # Prevent negative values
-    else:
-        # Company doesn't exist in April, all workers laid off
-        layoff_count = march_count
-    
-    # Only include companies with layoffs
-    if layoff_count > 0:
-        map_data.append({
-            'company_id': company_id,
-            'original_size': march_count,
-            'layoffs': layoff_count,
-            'layoff_percentage': (layoff_count / march_count * 100) if march_count > 0 else 0
-        })
-
-# Convert to DataFrame
-map_df = pd.DataFrame(map_data)
+# Load the data through the shared pipeline (reuses app.py's Feather cache)
+print("Loading data...")
+map_df = get_layoff_df()
+building_outlines = load_building_outlines()
+print(f"Loaded {int(np.isnan(building_outlines[0]).sum())} building outlines")
 print(f"Found {len(map_df)} companies with layoffs")
 
+# Check for missing location data
+missing_locations = map_df[map_df['x'].isna() | map_df['y'].isna()]
+if len(missing_locations) > 0:
+    print(f"Warning: {len(missing_locations)} companies have missing location data")
+    # Drop companies with missing locations
+    map_df = map_df.dropna(subset=['x', 'y'])
+    print(f"{len(map_df)} companies remain with valid location data")
+
 if len(map_df) > 0:
     print("Sample layoff data:")
     print(map_df.head())
     
-    # Add company size category
-    def assign_category(size):
-        if size >= 10:
-            return "Large (10+ employees)"
-        elif size >= 5:
-            return "Medium (5-9 employees)"
-        else:
-            return "Small (<5 employees)"
-    
-    map_df['size_category'] = map_df['original_size'].apply(assign_category)
-    
-    # Extract coordinates from location column in employers_df
-    print("Parsing location data...")
-    # Extract coordinates using string operations
-    def parse_point_coordinates(point_str):
-        coords = point_str.replace('POINT (', '').replace(')', '').split()
-        return float(coords[0]), float(coords[1])
-    
-    employers_df['x'], employers_df['y'] = zip(*employers_df['location'].apply(parse_point_coordinates))
-    
-    # Merge with map_df to get location data
-    map_df = map_df.merge(
-        employers_df[['employerId', 'x', 'y', 'buildingId']], 
-        left_on='company_id', 
-        right_on='employerId', 
-        how='left'
-    )
-    
-    # Use buildingId as name
-    map_df['name'] = map_df['buildingId'].fillna(map_df['company_id']).astype(str)
-    
-    # Check for missing location data
-    missing_locations = map_df[map_df['x'].isna() | map_df['y'].isna()]
-    if len(missing_locations) > 0:
-        print(f"Warning: {len(missing_locations)} companies have missing location data")
-        # Drop companies with missing locations
-        map_df = map_df.dropna(subset=['x', 'y'])
-        print(f"{len(map_df)} companies remain with valid location data")
-    
     # Now create the map with buildings and layoffs using Plotly
     print("Creating interactive map visualization...")
     
     # Create a Plotly figure
     fig = go.Figure()
     
-    # Process buildings data for Plotly
-    building_polygons = []
-    for _, building in buildings_df.iterrows():
-        # Parse the polygon string using shapely's wkt loader
-        polygon_str = building['location']
-        polygon = wkt.loads(polygon_str)
-        
-        # Get the exterior coordinates of the polygon
-        x, y = polygon.exterior.xy
-        
-        # Add polygon to the figure
-        fig.add_trace(go.Scatter(
-            x=list(x) + [x[0]],  # Close the polygon by adding the first point at the end
-            y=list(y) + [y[0]],
-            fill="toself",
-            fillcolor='rgba(0, 0, 0, 0)',  # Transparent fill
-            line=dict(color='rgba(80, 80, 80, 1)', width=1),  # Darker line for buildings
-            mode='lines',
-            hoverinfo='skip',
-            showlegend=False
-        ))
+    # Building footprints: one trace, NaN breaks between polygons
+    fig.add_trace(go.Scatter(
+        x=building_outlines[0],
+        y=building_outlines[1],
+        fill="toself",
+        fillcolor='rgba(0, 0, 0, 0)',  # Transparent fill
+        line=dict(color='rgba(80, 80, 80, 1)', width=1),  # Darker line for buildings
+        mode='lines',
+        hoverinfo='skip',
+        showlegend=False
+    ))
     
     # Add employer points with layoff information
     fig.add_trace(go.Scatter(
-        x=map_df['x'],
-        y=map_df['y'],
+        x=map_df['x'].to_numpy(np.float32),
+        y=map_df['y'].to_numpy(np.float32),
         mode='markers',
         marker=dict(
-            size=map_df['layoffs'].apply(lambda x: max(15, x*3)),
-            color=map_df['layoffs'],
+            size=np.maximum(15, map_df['layoffs'].to_numpy() * 3).astype(np.float32),
+            color=map_df['layoffs'].to_numpy(np.float32),
             colorscale='Reds',
             colorbar=dict(
                 title="Layoffs",
@@ -144,12 +63,11 @@ if len(map_df) > 0:
             ),
             line=dict(width=1, color='gray')  # Gray outline for circles
         ),
-        text=map_df.apply(
-            lambda row: f"ID: {row['company_id']}<br>" +
-                        f"Original Size: {row['original_size']}<br>" +
-                        f"Layoffs: {row['layoffs']}<br>" +
-                        f"Layoff %: {row['layoff_percentage']:.1f}%",
-            axis=1
+        text=(
+            "ID: " + map_df['company_id'].astype(str) +
+            "<br>Original Size: " + map_df['original_size'].astype(str) +
+            "<br>Layoffs: " + map_df['layoffs'].astype(str) +
+            "<br>Layoff %: " + map_df['layoff_percentage'].round(1).astype(str) + "%"
         ),
         hoverinfo='text',
         name='Employers with Layoffs'
@@ -0,0 +1,167 @@
+import pandas as pd
+import numpy as np
+import plotly.io as pio
+import shapely
+import os
+from functools import lru_cache
+
+# Shared load → diff → categorize → locate pipeline for the layoff views.
+# Results are memoized per process and the joined frame is cached on disk as
+# Feather, so app.py and layoff_map.py only redo the work when a source CSV
+# (or this module) changes.
+
+WORKERS_FILE = "restructure_data/workers_by_company_month.csv"
+EMPLOYERS_FILE = "Attributes/Employers.csv"
+BUILDINGS_FILE = "Attributes/Buildings.csv"
+BUILDINGS_CACHE = "restructure_data/building_outlines.npy"
+CACHE_DIR = "restructure_data/cache"
+LAYOFF_CACHE = os.path.join(CACHE_DIR, "march_companies.feather")
+# This module builds every cached result, so editing it invalidates the caches too
+PIPELINE_FILE = __file__
+
+# Only the columns the layoff views use, with compact dtypes
+WORKERS_USECOLS = ['month', 'employerId', 'worker_count']
+WORKERS_DTYPES = {'month': 'category', 'employerId': 'int32', 'worker_count': 'int32'}
+EMPLOYERS_USECOLS = ['employerId', 'location', 'buildingId']
+EMPLOYERS_DTYPES = {'employerId': 'int32'}
+
+SIZE_BINS = [-np.inf, 5, 10, np.inf]
+SIZE_LABELS = ["Small (<5 employees)", "Medium (5-9 employees)", "Large (10+ employees)"]
+
+
+# Building exterior rings as a (2, N) float32 array (x row, y row) with NaN breaks
+# between polygons, so each axis is one contiguous buffer for Plotly.
+# The WKT is parsed once with Shapely's vectorized reader and cached as .npy;
+# later runs memory-map the cache unless Buildings.csv (or this module) is newer.
+@lru_cache(maxsize=1)
+def load_building_outlines():
+    if os.path.exists(BUILDINGS_CACHE) and all(
+        os.path.getmtime(BUILDINGS_CACHE) >= os.path.getmtime(source) for source in [BUILDINGS_FILE, PIPELINE_FILE]
+    ):
+        return np.load(BUILDINGS_CACHE, mmap_mode='r')
+
+    rings = shapely.get_exterior_ring(shapely.from_wkt(pd.read_csv(BUILDINGS_FILE, usecols=['location'])['location'].to_numpy()))
+    coords, polygon_index = shapely.get_coordinates(rings, return_index=True)
+    # A NaN point after each ring ends its line (the rings are already closed)
+    ring_ends = np.r_[np.flatnonzero(np.diff(polygon_index)) + 1, len(coords)]
+    outlines = np.ascontiguousarray(np.insert(coords.astype(np.float32), ring_ends, np.nan, axis=0).T)
+    np.save(BUILDINGS_CACHE, outlines)
+    return outlines
+
+
+# Loads `cache_path` when it is newer than every file in `sources`; otherwise
+# rebuilds the frame with `build()` and writes it back as Feather
+def cached_frame(cache_path, sources, build):
+    if os.path.exists(cache_path) and all(
+        os.path.getmtime(cache_path) >= os.path.getmtime(source) for source in sources
+    ):
+        print(f"Using cached {cache_path}")
+        return pd.read_feather(cache_path)
+    df = build()
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    df.reset_index(drop=True).to_feather(cache_path)
+    return df
+
+
+# Loads the figure saved as `name` when it is newer than every file in `sources`;
+# otherwise builds it with `build()` and writes its JSON (orjson-encoded when that
+# is the configured engine, with numpy arrays as base64 typed arrays) to the cache
+def cached_figure(name, sources, build):
+    cache_path = os.path.join(CACHE_DIR, f"{name}.json")
+    if os.path.exists(cache_path) and all(
+        os.path.getmtime(cache_path) >= os.path.getmtime(source) for source in sources
+    ):
+        print(f"Using cached {cache_path}")
+        with open(cache_path, 'rb') as f:
+            return pio.from_json(f.read())
+    fig = build()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fig.write_json(cache_path)
+    return fig
+
+
+# Size category label for each company size (binned in one pass; plain strings
+# for the treemap labels)
+def size_category(original_size):
+    return pd.cut(original_size, bins=SIZE_BINS, labels=SIZE_LABELS, right=False).astype(str)
+
+
+# Layoffs between two months with one left join on employerId; companies
+# missing from the second month laid off all of their first-month workers
+def compute_layoffs(march_data, april_data):
+    companies = march_data[['employerId', 'worker_count']].rename(
+        columns={'employerId': 'company_id', 'worker_count': 'original_size'}
+    ).merge(
+        april_data[['employerId', 'worker_count']].rename(
+            columns={'employerId': 'company_id', 'worker_count': 'april_size'}
+        ),
+        on='company_id',
+        how='left',
+        validate='one_to_one'  # one row per employer per month
+    )
+    companies['layoffs'] = (
+        (companies['original_size'] - companies['april_size'].fillna(0))
+        .clip(lower=0)  # Prevent negative values
+        .astype(companies['original_size'].dtype)
+    )
+    companies = companies.drop(columns='april_size')
+    companies['layoff_percentage'] = companies['layoffs'] / companies['original_size'] * 100
+    return companies
+
+
+# One row per company active in March 2022: original size, layoffs by April,
+# size category and employer location
+def build_march_companies():
+    work_df = pd.read_csv(WORKERS_FILE, usecols=WORKERS_USECOLS, dtype=WORKERS_DTYPES)
+    employers_df = pd.read_csv(EMPLOYERS_FILE, usecols=EMPLOYERS_USECOLS, dtype=EMPLOYERS_DTYPES)
+    print(f"Loaded {len(work_df)} rows from workers data")
+    print(f"Loaded {len(employers_df)} rows from employers data")
+
+    # Print column names to verify structure
+    print(f"Workers columns: {work_df.columns.tolist()}")
+    print(f"Employers columns: {employers_df.columns.tolist()}")
+
+    # Get first month data (March 2022)
+    march_data = work_df[work_df['month'] == '2022-03']
+
+    # Get second month data (April 2022)
+    april_data = work_df[work_df['month'] == '2022-04']
+    print(f"Found {len(april_data)} companies in April 2022")
+
+    companies = compute_layoffs(march_data, april_data)
+    companies['size_category'] = size_category(companies['original_size'])
+
+    # Extract coordinates from location column in employers_df
+    print("Parsing location data...")
+    # Extract coordinates with one vectorized regex pass (float32 is plenty for display)
+    employers_df[['x', 'y']] = (
+        employers_df['location']
+        .str.extract(r'POINT \(([-+\d.eE]+) ([-+\d.eE]+)\)')
+        .astype(np.float32)
+    )
+
+    # Merge to get location data
+    companies = companies.merge(
+        employers_df[['employerId', 'x', 'y', 'buildingId']],
+        left_on='company_id',
+        right_on='employerId',
+        how='left'
+    )
+
+    # Use buildingId as name
+    companies['name'] = companies['buildingId'].fillna(companies['company_id']).astype(str)
+    return companies
+
+
+# All companies active in March 2022 (the joined frame is cached as Feather,
+# keyed on the source CSVs and this module)
+@lru_cache(maxsize=1)
+def get_march_companies():
+    return cached_frame(LAYOFF_CACHE, [WORKERS_FILE, EMPLOYERS_FILE, PIPELINE_FILE], build_march_companies)
+
+
+# Only the companies that laid off workers between March and April 2022
+@lru_cache(maxsize=1)
+def get_layoff_df():
+    march_companies = get_march_companies()
+    return march_companies[march_companies['layoffs'] > 0].reset_index(drop=True)
@@ -1,35 +1,49 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime
 
-# Read the data
-df = pd.read_csv("restructure_data/work.csv")
+# Read the data with PyArrow's multithreaded CSV reader, parsing the dates as
+# timestamps and keeping only the columns used below
+df = pacsv.read_csv(
+    "restructure_data/work.csv",
+    convert_options=pacsv.ConvertOptions(
+        include_columns=['date', 'participantId'],
+        column_types={'date': pa.timestamp('ns'), 'participantId': pa.int32()}
+    )
+).to_pandas()
 
-# Convert date to datetime and extract month-year
-df['date'] = pd.to_datetime(df['date'])
-df['month_year'] = df['date'].dt.strftime('%Y-%m')
+# Truncate the dates to the month start (an integer datetime64[M] key, so no
+# per-row string formatting)
+df['month_start'] = df['date'].values.astype('datetime64[M]')
 
-# Count unique workers per month
-monthly_workers = df.groupby('month_year')['participantId'].nunique().reset_index()
-monthly_workers.columns = ['month_year', 'worker_count']
+# Count unique workers per month: dedupe (month, participant code) pairs and
+# count rows per month, which stays in integer hashing throughout
+# (groupby sorts the months chronologically)
+df['pid_code'], _ = pd.factorize(df['participantId'])
+monthly_workers = (
+    df[['month_start', 'pid_code']].drop_duplicates()
+    .groupby('month_start').size()
+    .reset_index()
+)
+monthly_workers.columns = ['date', 'worker_count']
+# Format the month labels once per month instead of once per row
+monthly_workers['month_year'] = monthly_workers['date'].dt.strftime('%Y-%m')
 
 # Calculate month-over-month change
 monthly_workers['previous'] = monthly_workers['worker_count'].shift(1)
 monthly_workers['change'] = monthly_workers['worker_count'] - monthly_workers['previous']
 monthly_workers['pct_change'] = (monthly_workers['change'] / monthly_workers['previous'] * 100).round(1)
 
-# Sort by date for proper timeline
-monthly_workers['date'] = pd.to_datetime(monthly_workers['month_year'] + '-01')
-monthly_workers = monthly_workers.sort_values('date')
-
 # Create figure with secondary y-axis
 fig = make_subplots(specs=[[{"secondary_y": True}]])
 
-# Add area chart for total workers
+# Add area chart for total workers (WebGL-rendered, like the markers below)
 fig.add_trace(
-    go.Scatter(
+    go.Scattergl(
         x=monthly_workers['month_year'],
         y=monthly_workers['worker_count'],
         fill='tozeroy',
@@ -45,8 +59,8 @@ fig.add_trace(
         x=monthly_workers['month_year'],
         y=monthly_workers['change'],
         name='Monthly Change',
-        marker_color=monthly_workers['change'].apply(
-            lambda x: 'rgba(255, 50, 50, 0.6)' if x < 0 else 'rgba(50, 200, 50, 0.6)'
+        marker_color=np.where(
+            monthly_workers['change'].to_numpy() < 0, 'rgba(255, 50, 50, 0.6)', 'rgba(50, 200, 50, 0.6)'
         )
     ),
     secondary_y=True
@@ -55,7 +69,7 @@ fig.add_trace(
 # Add markers for significant events
 significant_months = monthly_workers[monthly_workers['pct_change'].abs() > 5]
 fig.add_trace(
-    go.Scatter(
+    go.Scattergl(
         x=significant_months['month_year'],
         y=significant_months['worker_count'],
         mode='markers+text',
@@ -65,25 +79,30 @@ fig.add_trace(
             color='rgba(255, 182, 0, 0.9)',
             line=dict(width=2, color='rgba(0, 0, 0, 0.5)')
         ),
-        text=significant_months['pct_change'].apply(lambda x: f"{x:+.1f}%"),
+        text=[f"{x:+.1f}%" for x in significant_months['pct_change'].to_numpy()],
         textposition="top center",
         name='Significant Changes',
         hoverinfo='text',
-        hovertext=significant_months.apply(
-            lambda row: f"Date: {row['month_year']}<br>Workers: {row['worker_count']}<br>Change: {row['change']} ({row['pct_change']}%)",
-            axis=1
-        )
+        hovertext=(
+            "Date: " + significant_months['month_year'] +
+            "<br>Workers: " + significant_months['worker_count'].astype(str) +
+            "<br>Change: " + significant_months['change'].astype(str) +
+            " (" + significant_months['pct_change'].astype(str) + "%)"
+        ).tolist()
     )
 )
 
-# Calculate and add trendline
-x_numeric = np.arange(len(monthly_workers))
-z = np.polyfit(x_numeric, monthly_workers['worker_count'], 1)
-p = np.poly1d(z)
+# Calculate and add trendline (closed-form least squares; no polyfit/SVD
+# needed for a straight line)
+x_numeric = np.arange(len(monthly_workers), dtype=np.float64)
+y_numeric = monthly_workers['worker_count'].to_numpy(np.float64)
+x_centered = x_numeric - x_numeric.mean()
+slope = (x_centered @ (y_numeric - y_numeric.mean())) / (x_centered @ x_centered)
+intercept = y_numeric.mean() - slope * x_numeric.mean()
 fig.add_trace(
     go.Scatter(
         x=monthly_workers['month_year'],
-        y=p(x_numeric),
+        y=intercept + slope * x_numeric,
         mode='lines',
         line=dict(color='rgba(0, 0, 0, 0.5)', width=2, dash='dash'),
         name='Trend'
@@ -1,13 +1,23 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import plotly.express as px
 import plotly.graph_objects as go
 import json
 import ast
+from layoff_pipeline import compute_layoffs, WORKERS_FILE, WORKERS_USECOLS, SIZE_BINS, SIZE_LABELS
 
-# Load the data
+# Load the data with PyArrow's multithreaded CSV reader (only the columns used,
+# with the same compact integer types as the shared pipeline)
 print("Loading data...")
-df = pd.read_csv("restructure_data/workers_by_company_month.csv")
+df = pacsv.read_csv(
+    WORKERS_FILE,
+    convert_options=pacsv.ConvertOptions(
+        include_columns=WORKERS_USECOLS,
+        column_types={'month': pa.string(), 'employerId': pa.int32(), 'worker_count': pa.int32()}
+    )
+).to_pandas()
 print(f"Loaded {len(df)} rows")
 
 # Print column names to verify structure
@@ -21,51 +31,24 @@ print(f"Found {len(march_data)} companies in March 2022")
 april_data = df[df['month'] == '2022-04'].copy()
 print(f"Found {len(april_data)} companies in April 2022")
 
-# Prepare data for treemap
-treemap_data = []
-
-# Convert worker counts from the "worker_count" column directly
-for _, company in march_data.iterrows():
-    company_id = company['employerId']
-    # Get worker count directly from the worker_count column (not 'count')
-    march_count = company['worker_count']
-    
-    # Find if company exists in April
-    april_company = april_data[april_data['employerId'] == company_id]
-    if len(april_company) > 0:
-        april_count = april_company.iloc[0]['worker_count']
-        layoff_count = max(0, march_count - april_count)  # Prevent negative values
-    else:
-        # Company doesn't exist in April, all workers laid off
-        layoff_count = march_count
-    
-    # Only include companies with layoffs
-    if layoff_count > 0:
-        treemap_data.append({
-            'company_id': company_id,
-            'original_size': march_count,
-            'layoffs': layoff_count,
-            'layoff_percentage': (layoff_count / march_count * 100) if march_count > 0 else 0
-        })
-
-# Convert to DataFrame
-treemap_df = pd.DataFrame(treemap_data)
+# Calculate layoffs with one join on employerId (shared with app.py) and
+# only include companies with layoffs
+treemap_df = compute_layoffs(march_data, april_data)
+treemap_df = treemap_df[treemap_df['layoffs'] > 0].reset_index(drop=True)
+# float32 is plenty for the hover percentages
+treemap_df['layoff_percentage'] = treemap_df['layoff_percentage'].astype(np.float32)
 print(f"Found {len(treemap_df)} companies with layoffs")
 
 if len(treemap_df) > 0:
     print("Sample layoff data:")
     print(treemap_df.head())
     
-    # Add company size category
-    def assign_category(size):
-        if size >= 10:
-            return "Large (10+ employees)"
-        elif size >= 5:
-            return "Medium (5-9 employees)"
-        else:
-            return "Small (<5 employees)"
-    
-    treemap_df['size_category'] = treemap_df['original_size'].apply(assign_category)
+    # Add company size category (binned in one pass; the categorical keeps the
+    # Small → Medium → Large order, and only categories that occur are kept)
+    treemap_df['size_category'] = pd.cut(
+        treemap_df['original_size'], bins=SIZE_BINS, labels=SIZE_LABELS, right=False
+    ).cat.remove_unused_categories()
+    categories = treemap_df['size_category'].cat.categories
     
     # Count companies in each category
     category_counts = treemap_df['size_category'].value_counts()
@@ -76,78 +59,51 @@ if len(treemap_df) > 0:
     # Create the main figure
     fig = go.Figure()
     
-    # Create data for hierarchical treemap (layoff count)
-    labels = ["All Companies"]  # Root node
-    parents = [""]  # Root has no parent
-    values = [treemap_df['layoffs'].sum()]  # Sum of all layoffs
-    
-    # Add category nodes
-    for category in sorted(treemap_df['size_category'].unique()):
-        labels.append(category)
-        parents.append("All Companies")
-        values.append(treemap_df[treemap_df['size_category'] == category]['layoffs'].sum())
-    
-    # Add company nodes with their parents as categories
-    for _, company in treemap_df.iterrows():
-        labels.append(str(company['company_id']))
-        parents.append(company['size_category'])
-        values.append(company['layoffs'])
-    
-    # Create customdata for hovering
-    # First calculate aggregated data for categories
-    category_data = {}
-    for category in treemap_df['size_category'].unique():
-        category_companies = treemap_df[treemap_df['size_category'] == category]
-        category_data[category] = {
-            'total_original_size': category_companies['original_size'].sum(),
-            'total_layoffs': category_companies['layoffs'].sum(),
-            'avg_layoff_pct': (category_companies['layoffs'].sum() / category_companies['original_size'].sum() * 100)
-        }
-    
-    # Start with data for root node (total of all companies)
-    custom_sizes = [treemap_df['original_size'].sum()]
-    custom_layoffs = [treemap_df['layoffs'].sum()]
-    custom_layoff_pct = [(treemap_df['layoffs'].sum() / treemap_df['original_size'].sum() * 100)]
-    
-    # Add data for category nodes
-    for category in sorted(treemap_df['size_category'].unique()):
-        custom_sizes.append(category_data[category]['total_original_size'])
-        custom_layoffs.append(category_data[category]['total_layoffs'])
-        custom_layoff_pct.append(category_data[category]['avg_layoff_pct'])
-    
-    # Add company-specific data
-    for _, company in treemap_df.iterrows():
-        custom_sizes.append(company['original_size'])
-        custom_layoffs.append(company['layoffs'])
-        custom_layoff_pct.append(company['layoff_percentage'])
+    # Per-category totals from one groupby (in category order)
+    category_totals = treemap_df.groupby('size_category', observed=True)[['original_size', 'layoffs']].sum()
+    
+    # Create data for hierarchical treemap (layoff count): the root and category
+    # nodes, then every company node (parented by its category) in bulk
+    labels = ["All Companies", *categories] + treemap_df['company_id'].astype(str).tolist()
+    parents = ["", *["All Companies"] * len(categories)] + treemap_df['size_category'].tolist()
+    values = [treemap_df['layoffs'].sum(), *category_totals['layoffs']] + treemap_df['layoffs'].tolist()
+    
+    # Create customdata for hovering: [original size, layoffs, layoff %] per node
+    # Root node (total of all companies), then category nodes, then one row per
+    # company, stacked into a single array
+    total_original_size = treemap_df['original_size'].sum()
+    total_layoffs = treemap_df['layoffs'].sum()
+    root_row = [total_original_size, total_layoffs, total_layoffs / total_original_size * 100]
+    category_rows = np.column_stack([
+        category_totals['original_size'],
+        category_totals['layoffs'],
+        category_totals['layoffs'] / category_totals['original_size'] * 100
+    ])
+    customdata = np.vstack([
+        root_row,
+        category_rows,
+        treemap_df[['original_size', 'layoffs', 'layoff_percentage']].to_numpy(np.float32)
+    ], dtype=np.float32)
     
     # Create color array for all nodes
     # Start with a default value for root and category nodes
     # We'll use a value outside our data range to ensure they receive a neutral color
-    color_array = [-1] * (len(treemap_df['size_category'].unique()) + 1)
+    color_array = [-1] * (len(categories) + 1)
     
     # Add company-specific size as color values
-    for _, company in treemap_df.iterrows():
-        color_array.append(company['original_size'])
+    color_array += treemap_df['original_size'].tolist()
     
     # Create line width array to only show borders on categories
-    # First create an array with the same length as labels
-    line_width_array = []
-    # Root node has border
-    line_width_array.append(1)  # Changed from 0 to 1 to add gray outline to "All Companies"
-    # Category nodes have gray border
-    for _ in range(len(treemap_df['size_category'].unique())):
-        line_width_array.append(1)
-    # Company nodes have no border
-    for _ in range(len(treemap_df)):
-        line_width_array.append(0)
+    # Root and category nodes have a gray border (the root was changed from 0 to 1
+    # to add a gray outline to "All Companies"); company nodes have no border
+    line_width_array = [1] * (len(categories) + 1) + [0] * len(treemap_df)
     
     # Add the treemap (sized by layoff count)
     fig.add_trace(go.Treemap(
         labels=labels,
         parents=parents,
         values=values,
-        customdata=np.column_stack([custom_sizes, custom_layoffs, custom_layoff_pct]),
+        customdata=customdata,
         hovertemplate='<b>%{label}</b><br>' +
                       '<b>Original Size:</b> %{customdata[0]}<br>' +
                       '<b>Layoffs:</b> %{customdata[1]}<br>' +
@@ -15,8 +15,8 @@ st.set_page_config(
 def load_data(filepath):
     """Loads and preprocesses the monthly summary CSV."""
     try:
-        df = pd.read_csv(filepath, parse_dates=['Month'])
-        df['Month'] = pd.to_datetime(df['Month'])
+        # PyArrow's multithreaded CSV reader parses the file and the Month dates in one pass
+        df = pd.read_csv(filepath, engine='pyarrow', parse_dates=['Month'])
         if df.empty:
             st.error("Error: Loaded DataFrame is empty.")
             return None
@@ -42,6 +42,11 @@ def load_data(filepath):
         # Important to do AFTER coercion
         df.fillna(0.0, inplace=True)
 
+        # Downcast float columns to float32 (participantId stays integer): halves
+        # the memory every month split, filter and group scan reads
+        float_cols = df.select_dtypes('float64').columns
+        df[float_cols] = df[float_cols].astype('float32')
+
         # Make participantId string for categorical use if needed
         df['participantId_str'] = df['participantId'].astype(str)
         return df
@@ -52,17 +57,33 @@ def load_data(filepath):
         st.error(f"An error occurred loading or processing CSV: {e}")
         return None
 
+@st.cache_resource
+def partition_by_month(filepath):
+    """Splits the loaded data into balance-sorted per-month frames with their end-balance lookups."""
+    # Cached as a shared resource keyed by path, so reruns skip the full-frame month scan.
+    # Each month is stored stably sorted by end_balance with its sorted balances
+    # (float64, to compare exactly against the slider values), so a balance range
+    # is a contiguous slice found by binary search
+    df = load_data(filepath)
+    month_groups = {}
+    for month, group in df.groupby('Month', sort=True):
+        group = group.sort_values('end_balance', kind='stable').reset_index(drop=True)
+        balances = group['end_balance'].to_numpy(np.float64)
+        month_groups[month] = (group, float(balances[0]), float(balances[-1]), balances)
+    return month_groups
+
 data_root = 'data'
 csv_file_path = f'{data_root}/monthly_financial_summary_detailed_all_participants.csv'
 df = load_data(csv_file_path)
 
 if df is None:
     st.stop()
+month_groups = partition_by_month(csv_file_path)
 
 # --- Get Unique Values for Widgets and Categories ---
 try:
     participants = sorted(df['participantId'].unique()) # Needed if adding participant selector later
-    months = sorted(df['Month'].unique())
+    months = list(month_groups) # Already sorted by partition_by_month
     if not months: raise ValueError("No valid months found.")
     month_labels = [pd.Timestamp(m).strftime('%Y-%m') for m in months]
 
@@ -97,7 +118,8 @@ if selected_month_label is None: st.stop()
 selected_month = months[month_labels.index(selected_month_label)]
 
 # --- Filter Data Based on Selected Month ---
-df_month = df[df['Month'] == selected_month].copy()
+# Shared cached frame: only filtered copies of it are modified below
+df_month, min_balance_overall, max_balance_overall, month_balances = month_groups[selected_month]
 if df_month.empty:
     st.warning(f"No data available for {selected_month_label}")
     st.stop()
@@ -114,8 +136,6 @@ if df_month.empty:
 # --- Streamlit Sliders for Filtering ---
 st.header("Filter Participants by Balance")
 
-min_balance_overall = float(df_month['end_balance'].min())
-max_balance_overall = float(df_month['end_balance'].max())
 if max_balance_overall == min_balance_overall: max_balance_overall += 1.0 # Handle edge case
 step_val = max(1.0, (max_balance_overall - min_balance_overall) / 100)
 
@@ -129,10 +149,10 @@ selected_min_balance, selected_max_balance = st.slider(
 )
 
 # --- Filter DataFrame based on Slider Values ---
-df_filtered = df_month[
-    (df_month['end_balance'] >= selected_min_balance) &
-    (df_month['end_balance'] <= selected_max_balance)
-].copy() # Create a copy
+# The month is sorted by balance, so the range is one slice between two binary searches
+left = np.searchsorted(month_balances, selected_min_balance, side='left')
+right = np.searchsorted(month_balances, selected_max_balance, side='right')
+df_filtered = df_month.iloc[left:right] # Only read below, so no copy is needed
 
 num_filtered = len(df_filtered)
 st.write(f"Processing {num_filtered} participants with balance between {selected_min_balance:,.0f} and {selected_max_balance:,.0f}.")
@@ -146,98 +166,100 @@ if num_filtered < num_groups:
 elif num_filtered > 0 and expense_amount_cols: # Check we have participants and expense columns
     try:
         # --- Create Quantile Groups ---
-        # Use pd.qcut to create bins based on quantiles
-        # Handle potential duplicate edges by adding a small jitter if needed or using rank
-        try:
-            df_filtered['Balance Group'], quantile_bins = pd.qcut(
-                df_filtered['end_balance'], q=num_groups, labels=False, retbins=True, duplicates='drop'
-            )
-        except ValueError as e:
-             # If 'drop' doesn't work due to too many duplicates at boundaries, try ranking first
-             if 'Bin edges must be unique' in str(e):
-                 st.info("Duplicate bin edges encountered, using rank-based quantiles.")
-                 df_filtered['Balance Group'] = pd.qcut(df_filtered['end_balance'].rank(method='first'), q=num_groups, labels=False, duplicates='drop')
-                 # Re-calculate approximate bins for labels if possible (might be less precise)
-                 min_b, max_b = df_filtered['end_balance'].min(), df_filtered['end_balance'].max()
-                 quantile_bins = np.linspace(min_b, max_b, num_groups + 1) # Approximate bins
-             else:
-                 raise e # Re-raise other ValueErrors
-
+        # Quantile edges as pd.qcut computes them (linear interpolation, duplicate
+        # edges dropped); the balances are already sorted, so each group is found
+        # by binary search and aggregated as one contiguous run
+        balances_sorted = df_filtered['end_balance'].to_numpy()
+        # Levels not exactly representable are rounded up, matching pd.qcut
+        levels = np.linspace(0, 1, num_groups + 1)
+        levels = np.where(num_groups * levels != np.arange(num_groups + 1), np.nextafter(levels, 1), levels)
+        quantile_bins = np.unique(np.quantile(balances_sorted, levels))
+        # All balances equal: keep the single bin [v, v], as pd.qcut does
+        if len(quantile_bins) == 1:
+            quantile_bins = np.repeat(quantile_bins, 2)
+        # Right-closed bins with the lowest edge included, as in pd.qcut
+        group_ids = np.searchsorted(quantile_bins[1:-1], balances_sorted, side='left')
+        group_starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+        present_groups = group_ids[group_starts]
 
         # Create descriptive labels, handling potential inconsistencies
-        actual_num_groups = df_filtered['Balance Group'].nunique()
+        actual_num_groups = len(present_groups)
         if actual_num_groups != len(quantile_bins) - 1:
              st.warning(f"Could only create {actual_num_groups} distinct groups instead of {num_groups} due to data distribution. Labels might be approximate.")
              # Fallback label generation if bins don't match groups
-             group_labels = [f"Group {i+1}" for i in range(actual_num_groups)]
-             label_map = {i: f"Group {i+1}" for i in sorted(df_filtered['Balance Group'].unique())}
+             label_map = {i: f"Group {i+1}" for i in present_groups}
 
         else:
             # Original label generation when bins match groups
             group_labels = [f"Group {i+1} (${quantile_bins[i]:,.0f} - ${quantile_bins[i+1]:,.0f})" for i in range(len(quantile_bins) - 1)]
             label_map = {i: label for i, label in enumerate(group_labels)}
 
-        # Map integer labels to descriptive labels
-        df_filtered['Balance Group Label'] = df_filtered['Balance Group'].map(label_map)
         grouping_col = 'Balance Group Label'
-        # Define sort order based on the generated labels (important for Altair)
-        # Ensure sorting happens correctly even if fallback labels were used
-        sort_order = sorted(df_filtered[grouping_col].unique(), key=lambda x: int(x.split(' ')[1].split('(')[0]))
+        # Sort order follows the group index (important for Altair)
+        sort_order = [label_map[i] for i in present_groups]
 
 
         # --- Aggregate Average Expenses per Group ---
-        cols_to_agg = [grouping_col] + expense_amount_cols
-        if grouping_col in df_filtered.columns:
-            df_agg = df_filtered[cols_to_agg].groupby(grouping_col, observed=False).mean().reset_index() # Use observed=False
-
-            # --- Melt/Fold Data for Stacking ---
-            df_melted = pd.melt(
-                df_agg, id_vars=[grouping_col], value_vars=expense_amount_cols,
-                var_name='Expense Column', value_name='Average Amount'
+        # One reduceat over the balance-sorted expense matrix sums every group's run
+        # (float32 input, accumulated in float64)
+        expenses_sorted = df_filtered[expense_amount_cols].to_numpy(np.float32)
+        group_sums = np.add.reduceat(expenses_sorted, group_starts, axis=0, dtype=np.float64)
+        group_counts = np.diff(np.r_[group_starts, len(balances_sorted)])
+        group_means = group_sums / group_counts[:, None]
+
+        # --- Fold Data for Stacking ---
+        # Long format straight from the (groups × categories) means matrix, in
+        # pd.melt's column-major order, without a wide intermediate frame
+        df_melted = pd.DataFrame({
+            grouping_col: np.tile(sort_order, len(expense_amount_cols)),
+            'Expense Column': np.repeat(expense_amount_cols, actual_num_groups),
+            'Average Amount': group_means.ravel(order='F'),
+            'Category': np.repeat([expense_cols_map[col] for col in expense_amount_cols], actual_num_groups),
+        })
+
+        # Calculate positive magnitude for plotting/filtering
+        # Using abs() is correct here, assuming expenses are negative but should be plotted positive
+        df_melted['Avg Spending Magnitude'] = df_melted['Average Amount'].abs()
+
+        # Filter out tiny values if needed (e.g., floating point noise), and pass
+        # Altair only the encoded columns, with float32 magnitudes, to keep the
+        # chart's embedded data small
+        df_melted_filtered = df_melted.loc[
+            df_melted['Avg Spending Magnitude'] > 1e-9, [grouping_col, 'Category', 'Avg Spending Magnitude']
+        ].astype({'Avg Spending Magnitude': 'float32'})
+
+        # --- Create Stacked Bar Chart ---
+        if not df_melted_filtered.empty:
+            chart_stacked_bar = alt.Chart(df_melted_filtered).mark_bar().encode(
+                # X-axis Configuration: Apply visibility improvements
+                x=alt.X(
+                    grouping_col,
+                    title='Balance Group within Selection', # Or 'Balance Group (Quantile Range)'
+                    sort=sort_order, # Use the defined sort order
+                    axis=alt.Axis(
+                        labelAngle=-60,         # Steeper angle
+                        labelOverlap='greedy',  # Strategy to avoid overlap
+                        labelLimit=150          # Max label width in pixels (optional)
+                    )
+                ),
+                # Y-axis: Use the positive magnitude
+                y=alt.Y('Avg Spending Magnitude', title='Average Amount Spent ($)', type='quantitative'),
+                # Color stacks by Category
+                color=alt.Color('Category', title='Expense Category', type='nominal', scale=alt.Scale(scheme='category10')),
+                # Order stacks (optional, default is alphabetical by color legend)
+                order=alt.Order('Category', sort='ascending'),
+                # Tooltip using magnitude
+                tooltip=[
+                    alt.Tooltip(grouping_col, title='Balance Group', type='nominal'),
+                    alt.Tooltip('Category', title='Expense Category', type='nominal'),
+                    alt.Tooltip('Avg Spending Magnitude', format='$,.2f', title='Avg. Amount ($)', type='quantitative')
+                ]
+            ).properties(
+                title=f"Average Expense Breakdown by Balance Group (n={actual_num_groups})" # Use actual groups count
             )
-            df_melted['Category'] = df_melted['Expense Column'].map(expense_cols_map)
-
-            # Calculate positive magnitude for plotting/filtering
-            # Using abs() is correct here, assuming expenses are negative but should be plotted positive
-            df_melted['Avg Spending Magnitude'] = df_melted['Average Amount'].abs()
-
-            # Filter out tiny values if needed (e.g., floating point noise)
-            df_melted_filtered = df_melted[df_melted['Avg Spending Magnitude'] > 1e-9].copy()
-
-            # --- Create Stacked Bar Chart ---
-            if not df_melted_filtered.empty:
-                chart_stacked_bar = alt.Chart(df_melted_filtered).mark_bar().encode(
-                    # X-axis Configuration: Apply visibility improvements
-                    x=alt.X(
-                        grouping_col,
-                        title='Balance Group within Selection', # Or 'Balance Group (Quantile Range)'
-                        sort=sort_order, # Use the defined sort order
-                        axis=alt.Axis(
-                            labelAngle=-60,         # Steeper angle
-                            labelOverlap='greedy',  # Strategy to avoid overlap
-                            labelLimit=150          # Max label width in pixels (optional)
-                        )
-                    ),
-                    # Y-axis: Use the positive magnitude
-                    y=alt.Y('Avg Spending Magnitude', title='Average Amount Spent ($)', type='quantitative'),
-                    # Color stacks by Category
-                    color=alt.Color('Category', title='Expense Category', type='nominal', scale=alt.Scale(scheme='category10')),
-                    # Order stacks (optional, default is alphabetical by color legend)
-                    order=alt.Order('Category', sort='ascending'),
-                    # Tooltip using magnitude
-                    tooltip=[
-                        alt.Tooltip(grouping_col, title='Balance Group', type='nominal'),
-                        alt.Tooltip('Category', title='Expense Category', type='nominal'),
-                        alt.Tooltip('Avg Spending Magnitude', format='$,.2f', title='Avg. Amount ($)', type='quantitative')
-                    ]
-                ).properties(
-                    title=f"Average Expense Breakdown by Balance Group (n={actual_num_groups})" # Use actual groups count
-                )
-                st.altair_chart(chart_stacked_bar, use_container_width=True)
-            else:
-                st.info("No non-zero average expense data to display for the selected groups.")
+            st.altair_chart(chart_stacked_bar, use_container_width=True)
         else:
-            st.error(f"Grouping column '{grouping_col}' not found after creating groups.")
+            st.info("No non-zero average expense data to display for the selected groups.")
 
     except ValueError as ve:
         st.warning(f"Could not create {num_groups} distinct balance groups for the selected range. Try adjusting the balance filter range or reducing the number of groups. Error: {ve}")
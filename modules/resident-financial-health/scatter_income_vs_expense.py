@@ -33,6 +33,8 @@ print("Generating Income vs. Absolute Expense Scatter Plot...")
 # Configuration
 # ──────────────────────────────────────────────
 DATA_FILE = os.path.join("data", "monthly_participant_logged_spending_demographics.csv")
+# Month-sorted Parquet copy written by preprocess_financial.py (preferred when present)
+PARQUET_FILE = DATA_FILE.replace(".csv", ".parquet")
 TARGET_MONTH = "2023-05"
 FIXED_AXIS_LIMIT = 20000
 
@@ -42,38 +44,54 @@ CMAP_NAME = "Blues"
 COLORBAR_MIN = -5000
 COLORBAR_MAX = 25000
 
+# Columns the plot needs
+required_cols = ["logged_income_total", "logged_expense_total", COLOR_VAR, "householdSize"]
+
 OUTPUT_FILENAME = f"income_vs_abs_expense_scatter_blue_{TARGET_MONTH}.png"
 
 # ──────────────────────────────────────────────
 # Load and Filter Data
 # ──────────────────────────────────────────────
-print(f"Loading data from {DATA_FILE}...")
-try:
-    df = pd.read_csv(DATA_FILE)
-    df["Month"] = pd.to_datetime(df["Month"], errors="coerce")
-    df = df.dropna(subset=["Month"])
-    print(f"Loaded: {df.shape}")
-except FileNotFoundError:
-    print(f"ERROR: File not found at {DATA_FILE}.")
-    exit()
-
-print(f"Filtering for {TARGET_MONTH}...")
-df_month = df[df["Month"] == pd.Timestamp(TARGET_MONTH)].copy()
+if os.path.exists(PARQUET_FILE):
+    # Predicate pushdown on Month: only the target month's row group and the
+    # plotted columns are read
+    print(f"Loading {TARGET_MONTH} from {PARQUET_FILE}...")
+    df_month = pd.read_parquet(
+        PARQUET_FILE,
+        columns=required_cols,
+        filters=[("Month", "==", pd.Timestamp(TARGET_MONTH).date())],
+    )
+else:
+    print(f"Loading data from {DATA_FILE}...")
+    try:
+        df = pd.read_csv(DATA_FILE)
+        df["Month"] = pd.to_datetime(df["Month"], errors="coerce")
+        df = df.dropna(subset=["Month"])
+        print(f"Loaded: {df.shape}")
+    except FileNotFoundError:
+        print(f"ERROR: File not found at {DATA_FILE}.")
+        exit()
+
+    print(f"Filtering for {TARGET_MONTH}...")
+    # Compare the raw int64 ticks against the target in the column's own unit,
+    # instead of boxing each element for a Timestamp comparison
+    months = df["Month"].to_numpy()
+    target = np.datetime64(TARGET_MONTH).astype(months.dtype)
+    df_month = df[months.view("i8") == target.view("i8")]
 if df_month.empty:
     print(f"ERROR: No data for {TARGET_MONTH}.")
     exit()
 print(f"Found {len(df_month)} records.")
 
-# Prepare numeric columns and drop NaNs
-required_cols = ["logged_income_total", "logged_expense_total", COLOR_VAR, "householdSize"]
-for col in required_cols:
-    df_month[col] = pd.to_numeric(df_month[col], errors="coerce")
-
-df_plot = df_month.dropna(subset=required_cols).copy()
+# Prepare numeric columns and drop NaNs: coerce once into one float32 matrix and
+# keep the rows with no missing value
+values = df_month[required_cols].apply(pd.to_numeric, errors="coerce").to_numpy(np.float32)
+values = values[~np.isnan(values).any(axis=1)]
+df_plot = pd.DataFrame(values, columns=required_cols)
 print(f"Valid rows for plotting: {len(df_plot)}")
 
-df_plot["abs_logged_expense"] = df_plot["logged_expense_total"].abs()
-df_plot["householdSize"] = df_plot["householdSize"].astype(float).clip(lower=1.0)
+df_plot["abs_logged_expense"] = np.abs(values[:, 1])
+df_plot["householdSize"] = np.clip(values[:, 3], 1.0, None)
 
 # ──────────────────────────────────────────────
 # Create Scatter Plot
@@ -82,25 +100,28 @@ print("Creating plot...")
 try:
     fig, ax = plt.subplots(figsize=(12, 8))
 
-    x_data = df_plot["logged_income_total"]
-    y_data = df_plot["abs_logged_expense"]
-    color_data = df_plot[COLOR_VAR]
-    size_data = df_plot["householdSize"] * 25
+    x_data = df_plot["logged_income_total"].to_numpy(np.float32)
+    y_data = df_plot["abs_logged_expense"].to_numpy(np.float32)
+    color_data = df_plot[COLOR_VAR].to_numpy(np.float32)
+    size_data = df_plot["householdSize"].to_numpy(np.float32) * 25
 
     # Color mapping: sequential blue with fixed range
     norm = mcolors.Normalize(vmin=COLORBAR_MIN, vmax=COLORBAR_MAX)
-    cmap = cm.get_cmap(CMAP_NAME)
+    cmap = plt.get_cmap(CMAP_NAME)
+    # Map the colors to an RGBA buffer once, so drawing skips the norm/colormap pass
+    rgba = cmap(norm(color_data)).astype(np.float32)
 
-    scatter = ax.scatter(
+    ax.scatter(
         x_data, y_data,
-        c=color_data, s=size_data,
-        cmap=cmap, norm=norm,
+        c=rgba, s=size_data,
         alpha=0.7, edgecolors="grey", linewidth=0.5,
         label="Participants (Size=HH Size)",
     )
 
-    # Colorbar
-    cbar = fig.colorbar(scatter, ax=ax, pad=0.02)
+    # Colorbar (from a standalone mappable, as the points carry precomputed colors)
+    mappable = cm.ScalarMappable(norm=norm, cmap=cmap)
+    mappable.set_array([])
+    cbar = fig.colorbar(mappable, ax=ax, alpha=0.7, pad=0.02)  # same transparency as the points
     cbar.set_label(f'{COLOR_VAR.replace("_", " ").title()} ($)', fontsize=10)
 
     # Reference line: Income = |Expense|